@@ -2,22 +2,14 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from events import (
-    AttackEvent,
-    BuildingInteractEvent,
-    DropEvent,
-    MoveEvent,
-    attack_signal,
-    building_interact_signal,
-    drop_signal,
-    move_signal,
-)
+from entity import Item
+from events import AttackEvent, BuildingInteractEvent, DropEvent, MoveEvent
 import color
 import exceptions
 
 if TYPE_CHECKING:
     from engine import Engine
-    from entity import Actor, IntelligentActor, Building, Entity, Item
+    from entity import Actor, IntelligentActor, Building, Entity
 
 from abc import ABC, abstractmethod
 
@@ -59,12 +51,12 @@ class PickupAction(Action):
         actor_location_y = self.entity.y
         inventory = self.entity.inventory
 
-        for item in self.engine.game_map.items:
-            if actor_location_x == item.x and actor_location_y == item.y:
+        for item in self.engine.game_map.get_entities_at_location(actor_location_x, actor_location_y):
+            if isinstance(item, Item):
                 if len(inventory.items) >= inventory.capacity:
                     raise exceptions.Impossible("Your inventory is full.")
 
-                self.engine.game_map.entities.remove(item)
+                self.engine.game_map.remove_entity(item)
                 item.parent = self.entity.inventory
                 inventory.items.append(item)
 
@@ -168,7 +160,7 @@ class ItemAction(Action):
 class DropItem(ItemAction):
     def perform(self) -> None:
         self.entity.inventory.drop(self.item)
-        drop_signal.send(DropEvent(self.entity.x, self.entity.y, self.entity, self.item))
+        self.engine.game_map.event_bus.publish(DropEvent(self.entity.x, self.entity.y, self.entity.id, self.item.id))
 
 
 class WaitAction(Action):
@@ -213,14 +205,13 @@ class BuildingInteractAction(ActionWithDirection):
         if not target:
             raise exceptions.Impossible("No building to interact with.")
 
-        building_interact_signal.send(
-            self,
-            event=BuildingInteractEvent(
+        self.engine.game_map.event_bus.publish(
+            BuildingInteractEvent(
                 self.entity.x,
                 self.entity.y,
-                self.entity,
-                target,
-            ),
+                self.entity.id,
+                target.id,
+            )
         )
         target.interactable.interact(self)
 
@@ -233,14 +224,13 @@ class MeleeAction(ActionWithDirection):
 
         damage = self.entity.fighter.power - target.fighter.defense
 
-        attack_signal.send(
-            self,
-            event=AttackEvent(
+        self.engine.game_map.event_bus.publish(
+            AttackEvent(
                 self.entity.x,
                 self.entity.y,
-                self.entity,
-                target,
-            ),
+                self.entity.id,
+                target.id,
+            )
         )
 
         attack_desc = f"{self.entity.name.capitalize()} attacks {target.name}"
@@ -263,22 +253,21 @@ class MovementAction(ActionWithDirection):
         if not self.engine.game_map.in_bounds(dest_x, dest_y):
             # Destination is out of bounds.
             raise exceptions.Impossible("That way is blocked.")
-        if not self.engine.game_map.tiles["walkable"][dest_x, dest_y]:
+        if not self.engine.game_map.tiles[dest_x, dest_y]["walkable"]:
             # Destination is blocked by a tile.
             raise exceptions.Impossible("That way is blocked.")
         if self.engine.game_map.get_blocking_entity_at_location(dest_x, dest_y):
             # Destination is blocked by an entity.
             raise exceptions.Impossible("That way is blocked.")
 
-        move_signal.send(
-            self,
-            event=MoveEvent(
+        self.engine.game_map.event_bus.publish(
+            MoveEvent(
                 self.entity.x,
                 self.entity.y,
-                self.entity,
+                self.entity.id,
                 self.dx,
                 self.dy,
-            ),
+            )
         )
         self.entity.move(self.dx, self.dy)
 
@@ -0,0 +1,184 @@
+"""Storage of maps which are too large to be kept in memory at once.
+
+Such maps are split into square chunks of CHUNK_SIZE tiles. A chunk is generated when it is needed for
+the first time. Chunks which are not needed any more are written to disk and dropped from memory, and
+read back when they are needed again.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+import os
+
+from numpy.typing import NDArray
+import numpy as np
+
+import tile_types
+
+CHUNK_SIZE = 32
+
+ChunkKey = tuple[int, int]
+# Index of the part of an area inside a chunk, in the chunk and in the area.
+ChunkPart = tuple[ChunkKey, tuple[slice, slice], tuple[slice, slice]]
+
+
+def chunk_of(x: int, y: int) -> ChunkKey:
+    return x // CHUNK_SIZE, y // CHUNK_SIZE
+
+
+def chunks_around(x: int, y: int, radius: int) -> Iterator[ChunkKey]:
+    """Yield the chunks at most `radius` chunks away from the chunk of (x, y)."""
+    cx, cy = chunk_of(x, y)
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            if cx + dx >= 0 and cy + dy >= 0:
+                yield cx + dx, cy + dy
+
+
+def chunk_parts(x0: int, y0: int, x1: int, y1: int) -> Iterator[ChunkPart]:
+    """Split the area from (x0, y0) to (x1, y1), exclusive, by the chunks it overlaps."""
+    for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+        for cy in range(y0 // CHUNK_SIZE, (y1 - 1) // CHUNK_SIZE + 1):
+            left, top = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+            part_x0, part_y0 = max(x0, left), max(y0, top)
+            part_x1, part_y1 = min(x1, left + CHUNK_SIZE), min(y1, top + CHUNK_SIZE)
+            yield (
+                (cx, cy),
+                (slice(part_x0 - left, part_x1 - left), slice(part_y0 - top, part_y1 - top)),
+                (slice(part_x0 - x0, part_x1 - x0), slice(part_y0 - y0, part_y1 - y0)),
+            )
+
+
+def _raw(tiles: NDArray[Any]) -> NDArray[np.uint8]:
+    """Bytes of Fortran-ordered tiles, indexed [y, x]. Copying them is much faster than copying tiles."""
+    return tiles.T.view(np.uint8).reshape(tiles.shape[1], tiles.shape[0], tiles.itemsize)
+
+
+class ChunkedTiles:
+    """Tiles of a map, generated chunk by chunk by `generate(x, y, tiles)`.
+
+    Supports the indexing the game uses on arrays of tiles: `tiles[x, y]` for a single tile and
+    `tiles[x0:x1, y0:y1]` for an area. Unlike with arrays, areas are copies.
+    """
+
+    def __init__(self, directory: str, generate: Callable[[int, int, NDArray[Any]], None]):
+        self.directory = directory
+        self.generate = generate
+        self.chunks: dict[ChunkKey, NDArray[Any]] = {}
+        self.generated: set[ChunkKey] = set()  # Including the chunks on disk.
+        os.makedirs(directory, exist_ok=True)
+
+    def __getitem__(self, index: tuple[Any, Any]) -> Any:
+        x, y = index
+        if isinstance(x, slice):
+            return self.window(x.start, y.start, x.stop, y.stop)
+        return self.chunk(chunk_of(x, y))[x % CHUNK_SIZE, y % CHUNK_SIZE]
+
+    def chunk(self, key: ChunkKey) -> NDArray[Any]:
+        tiles = self.chunks.get(key)
+        if tiles is not None:
+            return tiles
+
+        if key in self.generated:
+            tiles = np.load(self._path(key))
+            self.chunks[key] = tiles
+        else:
+            tiles = np.full((CHUNK_SIZE, CHUNK_SIZE), fill_value=tile_types.wall, order="F")
+            self.chunks[key] = tiles  # Generation may look at the chunk itself.
+            self.generated.add(key)
+            self.generate(key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE, tiles)
+        return tiles
+
+    def window(self, x0: int, y0: int, x1: int, y1: int) -> NDArray[Any]:
+        """Return a copy of the tiles from (x0, y0) to (x1, y1), exclusive."""
+        result = np.empty((x1 - x0, y1 - y0), dtype=tile_types.tile_dt, order="F")
+        raw = _raw(result)
+        for key, inside, outside in chunk_parts(x0, y0, x1, y1):
+            raw[outside[::-1]] = _raw(self.chunk(key))[inside[::-1]]
+        return result
+
+    def unload(self, keep: Iterable[ChunkKey]) -> None:
+        """Write every chunk but the ones in `keep` to disk."""
+        keep = set(keep)
+        for key in [key for key in self.chunks if key not in keep]:
+            np.save(self._path(key), self.chunks.pop(key), allow_pickle=False)
+
+    def _path(self, key: ChunkKey) -> str:
+        return os.path.join(self.directory, f"tiles_{key[0]}_{key[1]}.npy")
+
+
+class ChunkedExplored:
+    """Tiles seen by actors, as packed bits with one row per actor like in FOVSystem, but chunk by chunk.
+
+    Chunks nobody has seen take no memory. When a row is cleared, chunks on disk are cleared when they are
+    read back: every chunk remembers the version at which it was written and every row the version at
+    which it was cleared.
+    """
+
+    def __init__(self, directory: str, capacity: int):
+        self.directory = directory
+        self.capacity = capacity
+        self.chunks: dict[ChunkKey, NDArray[np.uint8]] = {}
+        self.saved: dict[ChunkKey, int] = {}
+        self.cleared = np.zeros(capacity, dtype=np.int64)
+        self.version = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def chunk(self, key: ChunkKey, create: bool = False) -> NDArray[np.uint8] | None:
+        bits = self.chunks.get(key)
+        if bits is None:
+            if key in self.saved:
+                bits = np.load(self._path(key))
+                bits[self.cleared[: len(bits)] > self.saved.pop(key)] = 0
+            elif create:
+                bits = np.zeros((self.capacity, CHUNK_SIZE, CHUNK_SIZE // 8), dtype=np.uint8)
+            else:
+                return None
+            self.chunks[key] = bits
+        if len(bits) < self.capacity:
+            missing = np.zeros((self.capacity - len(bits), *bits.shape[1:]), dtype=np.uint8)
+            bits = self.chunks[key] = np.concatenate([bits, missing])
+        return bits
+
+    def grow(self, capacity: int) -> None:
+        """Make room for rows up to `capacity`. Chunks grow when they are used."""
+        self.cleared = np.concatenate([self.cleared, np.zeros(capacity - self.capacity, dtype=np.int64)])
+        self.capacity = capacity
+
+    def clear(self, row: int) -> None:
+        self.version += 1
+        self.cleared[row] = self.version
+        for bits in self.chunks.values():
+            if row < len(bits):
+                bits[row] = 0
+
+    def window(self, row: int, x0: int, y0: int, x1: int, y1: int) -> NDArray[np.bool_]:
+        """Return the tiles from (x0, y0) to (x1, y1), exclusive, which were seen by `row`."""
+        result = np.zeros((x1 - x0, y1 - y0), dtype=bool, order="F")
+        for key, inside, outside in chunk_parts(x0, y0, x1, y1):
+            bits = self.chunk(key)
+            if bits is not None:
+                result[outside] = np.unpackbits(bits[row], axis=1, count=CHUNK_SIZE).view(bool)[inside]
+        return result
+
+    def mark(self, row: int, x0: int, y0: int, seen: NDArray[np.bool_]) -> None:
+        """Add the tiles in `seen`, an area starting at (x0, y0), to the tiles seen by `row`."""
+        for key, inside, outside in chunk_parts(x0, y0, x0 + seen.shape[0], y0 + seen.shape[1]):
+            part = seen[outside]
+            if not part.any():
+                continue
+            bits = self.chunk(key, create=True)
+            assert bits is not None
+            explored = np.unpackbits(bits[row], axis=1, count=CHUNK_SIZE)
+            explored[inside] |= part
+            bits[row] = np.packbits(explored, axis=1)
+
+    def unload(self, keep: Iterable[ChunkKey]) -> None:
+        """Write every chunk but the ones in `keep` to disk."""
+        keep = set(keep)
+        for key in [key for key in self.chunks if key not in keep]:
+            np.save(self._path(key), self.chunks.pop(key), allow_pickle=False)
+            self.saved[key] = self.version
+
+    def _path(self, key: ChunkKey) -> str:
+        return os.path.join(self.directory, f"explored_{key[0]}_{key[1]}.npy")
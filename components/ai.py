@@ -1,12 +1,10 @@
 from __future__ import annotations
 
 from abc import abstractmethod
-from collections import deque
 from typing import TYPE_CHECKING
-import random
 
+from numpy.typing import NDArray
 import numpy as np  # type: ignore
-import tcod
 
 from actions import (
     Action,
@@ -20,11 +18,17 @@ from actions import (
     ObserveStatsAction,
     WaitAction,
 )
+from game_time import current_tick
 from llm import generate_reflection
+from pathfinding import UNREACHABLE
+from rng import world
 import tile_types
 
 if TYPE_CHECKING:
+    from concurrent.futures import Future
+
     from entity import Actor, IntelligentActor
+    from game_map import Area
 
 from langchain.agents import AgentType, Tool, initialize_agent
 from langchain.chat_models import ChatOpenAI
@@ -41,29 +45,10 @@ class BaseAI(Action):
 
         If there is no valid path then returns an empty list.
         """
-        # Copy the walkable array.
-        cost = np.array(self.entity.game_map.tiles["walkable"], dtype=np.int8)
-
-        for entity in self.entity.game_map.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.x, entity.y] += 10
-
-        # Create a graph from the cost array and pass that graph to a new pathfinder.
-        graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
-        pathfinder = tcod.path.Pathfinder(graph)
-
-        pathfinder.add_root((self.entity.x, self.entity.y))  # Start position.
-
-        # Compute the path to the destination and remove the starting point.
-        path: list[list[int]] = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
-
-        # Convert from List[List[int]] to List[Tuple[int, int]].
-        return [(index[0], index[1]) for index in path]
+        # Every AI heading to the same destination during a tick reads the same distance field.
+        return self.entity.game_map.distance_fields.path(
+            (self.entity.x, self.entity.y), (dest_x, dest_y), tick=current_tick()
+        )
 
 
 class IntelligentCreature(BaseAI):
@@ -71,27 +56,24 @@ class IntelligentCreature(BaseAI):
 
     def look_around(self) -> str:
         game_map = self.entity.game_map
-        fov = self.entity.visible
 
         my_tile = game_map.tiles[self.entity.x, self.entity.y]
         my_tile_name = tile_types.get_name(my_tile)
 
         vision_log = [f"I am staying on {my_tile_name} at [{self.entity.x}, {self.entity.y}]. I see the following:"]
 
-        for x in range(game_map.width):
-            for y in range(game_map.height):
-                if not fov[x, y]:
+        # Only visit the visible tiles which have anything on them, in the same x-major order as a full scan.
+        for x, y in sorted(xy for xy in game_map.index.cells if game_map.fov.is_visible(self.entity, *xy)):
+            for e in game_map.get_entities_at_location(x, y):
+                if e == self.entity:
                     continue
-                for e in game_map.get_entities_at_location(x, y):
-                    if e == self.entity:
-                        continue
-                    vision_log.append(f"  - {e} at [{x}, {y}]")
+                vision_log.append(f"  - {e} at [{x}, {y}]")
 
-                actor = game_map.get_actor_at_location(x, y)
-                if actor and actor != self.entity:
-                    is_new_relationship = self.entity.relationships.meet(actor)
-                    if is_new_relationship:
-                        self.entity.observation_log.add(f"I met {actor} at [{x}, {y}]")
+            actor = game_map.get_actor_at_location(x, y)
+            if actor and actor != self.entity:
+                is_new_relationship = self.entity.relationships.meet(actor)
+                if is_new_relationship:
+                    self.entity.observation_log.add(f"I met {actor} at [{x}, {y}]")
 
         vision_text = "\n".join(vision_log)
         self.entity.observation_log.add(vision_text)
@@ -122,11 +104,13 @@ class IntelligentCreature(BaseAI):
         self.entity.observation_log.add(text=f"My origin: {identity_report}")
         return identity_report
 
-    def reflect(self) -> str:
-        """Reflection as in 'Generative Agents' paper"""
-        reflection = generate_reflection(self.entity.name, self.entity.observation_log)
-        self.entity.observation_log.add(reflection)
-        return reflection
+    def reflect(self) -> Future[str]:
+        """Reflection as in 'Generative Agents' paper.
+
+        The reflection is generated in the background and observed on the tick it arrives.
+        """
+        observation_log = self.entity.observation_log
+        return generate_reflection(self.entity.name, observation_log, on_done=observation_log.add)
 
 
 # TODO temporary?
@@ -135,58 +119,32 @@ class AutoExploreAI(IntelligentCreature):
         super().__init__(entity)
         self.path: list[tuple[int, int]] = []
 
-    def create_dijkstra_map(self):
-        """
-        Idea from http://www.roguebasin.com/index.php/The_Incredible_Power_of_Dijkstra_Maps
-        Implementation is mine (more efficient)
+    def create_dijkstra_map(self, area: Area) -> NDArray[np.int32]:
+        """Return the distance from every tile of the area to the closest unexplored one.
+
+        The map is shared with other explorers which have explored the same tiles.
         """
         game_map = self.entity.game_map
-        dijkstra_map = np.full((game_map.width, game_map.height), np.inf)
-
-        queue: deque[tuple[int, int, int]] = deque()
-
-        print("Expolred tiles:", sum(self.entity.explored.flatten()))
-        for x in range(game_map.width):
-            for y in range(game_map.height):
-                # Cheating because agents have no way to know what tiles are walkable but it's fine for now
-                # TODO: shall draw boundary around explored area for efficiency
-                if self.entity.explored[x, y] is False and game_map.tiles["walkable"][x, y]:
-                    dijkstra_map[x, y] = 0
-                    queue.append((x, y, 0))
-
-        while queue:
-            x, y, distance = queue.popleft()
-            neighbors = game_map.get_neighbors(x, y)
-            for nx, ny in neighbors:
-                if (
-                    dijkstra_map[nx, ny] == np.inf
-                    and game_map.tiles["walkable"][nx, ny]
-                    and game_map.get_blocking_entity_at_location(nx, ny) is None
-                ):
-                    dijkstra_map[nx, ny] = distance + 1
-                    queue.append((nx, ny, distance + 1))
-
-        def _print():
-            for y in range(game_map.height):
-                printed_row = False
-                for x in range(game_map.width):
-                    if self.entity.visible[x, y] is True:
-                        print(dijkstra_map[x, y], end=" ")
-                        printed_row = True
-                if printed_row:
-                    print()
-
-        return dijkstra_map
+        # Cheating because agents have no way to know what tiles are walkable but it's fine for now
+        goals = game_map.window(area)["walkable"] & ~game_map.fov.explored(self.entity, area)
+        return game_map.dijkstra_maps.get(goals, origin=area[:2])
 
     def autoexplore(self) -> tuple[int, int]:
-        dijkstra_map = self.create_dijkstra_map()
-        min_val = np.inf
+        game_map = self.entity.game_map
+        x0, y0, x1, y1 = area = game_map.local_area(self.entity.x, self.entity.y)
+        dijkstra_map = self.create_dijkstra_map(area)
+        min_val = UNREACHABLE
         dest_x, dest_y = 0, 0
         ds = [(dx, dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if dx != 0 or dy != 0]
         for dx, dy in ds:
             nx, ny = self.entity.x + dx, self.entity.y + dy
-            if dijkstra_map[nx, ny] < min_val:
-                min_val = dijkstra_map[nx, ny]
+            if (
+                x0 <= nx < x1
+                and y0 <= ny < y1
+                and dijkstra_map[nx - x0, ny - y0] < min_val
+                and not game_map.get_blocking_entity_at_location(nx, ny)
+            ):
+                min_val = dijkstra_map[nx - x0, ny - y0]
                 dest_x, dest_y = dx, dy
         print(f"Autoexplore: {dest_x}, {dest_y}. Minval {min_val}")
         return dest_x, dest_y
@@ -233,7 +191,7 @@ class ReActAgentHuman(IntelligentCreature):
             ),
             Tool(
                 name="Reflect",
-                func=lambda _input: self.reflect(),
+                func=lambda _input: self.reflect().result(),
                 description="useful to get to know yourself. It will give a summary of all your observations",
             ),
         ]
@@ -252,20 +210,20 @@ class RandomActingHuman(IntelligentCreature):
         self.path: list[tuple[int, int]] = []
 
     def perform(self) -> None:
-        dest_x = random.randint(-1, 2)
-        dest_y = random.randint(-1, 2)
+        dest_x = world.randint(-1, 2)
+        dest_y = world.randint(-1, 2)
 
-        if random.random() < 0.01:
+        if world.random() < 0.01:
             return ObserveStatsAction(self.entity).perform()
-        if random.random() < 0.02:
+        if world.random() < 0.02:
             return ObserveNeedsAction(self.entity).perform()
-        if random.random() < 0.03:
+        if world.random() < 0.03:
             return ObserveInventoryAction(self.entity).perform()
-        if random.random() < 0.05:
+        if world.random() < 0.05:
             return ObserveIdentityAction(self.entity).perform()
-        if random.random() < 0.1:
+        if world.random() < 0.1:
             return LookAroundAction(self.entity).perform()
-        if random.random() < 0.2:
+        if world.random() < 0.2:
             return WaitAction(self.entity).perform()
         return MovementAction(self.entity, dest_x, dest_y).perform()
 
@@ -281,7 +239,7 @@ class HostileEnemy(BaseAI):
         dy = target.y - self.entity.y
         distance = max(abs(dx), abs(dy))  # Chebyshev distance.
 
-        if self.engine.game_map.visible[self.entity.x, self.entity.y]:
+        if target.can_see(self.entity.x, self.entity.y):
             if distance <= 1:
                 return MeleeAction(self.entity, dx, dy).perform()
 
@@ -318,7 +276,7 @@ class ConfusedEnemy(BaseAI):
             self.entity.ai = self.previous_ai
             return
         # Pick a random direction
-        direction_x, direction_y = random.choice(
+        direction_x, direction_y = world.choice(
             [
                 (-1, -1),  # Northwest
                 (0, -1),  # North
@@ -33,13 +33,14 @@ class Consumable(BaseComponent):
         """
 
     def consume(self) -> None:
-        """Remove the consumed item from its containing inventory."""
+        """Remove the consumed item from its containing inventory. Its id is not used again."""
         item = self.parent
         inventory = item.parent
 
         if isinstance(inventory, components.inventory.Inventory):
             inventory.items.remove(item)
             inventory.parent.observation_log.add(f"I consumed the {self.parent.name}")
+            inventory.game_map.registry.release(item)
 
 
 class Food(Consumable):
@@ -67,7 +68,7 @@ class ConfusionConsumable(Consumable):
         consumer = action.entity
         target = action.target_actor
 
-        if not self.engine.game_map.visible[action.target_xy]:
+        if not self.engine.player.can_see(*action.target_xy):
             raise Impossible("You cannot target an area that you cannot see.")
         if not target:
             raise Impossible("You must select an enemy to target.")
@@ -102,7 +103,7 @@ class FireballDamageConsumable(Consumable):
     def activate(self, action: actions.ItemAction) -> None:
         target_xy = action.target_xy
 
-        if not self.engine.game_map.visible[target_xy]:
+        if not self.engine.player.can_see(*target_xy):
             raise Impossible("You cannot target an area that you cannot see.")
 
         targets_hit = False
@@ -141,7 +142,7 @@ class LightningDamageConsumable(Consumable):
         closest_distance = self.maximum_range + 1.0
 
         for actor in self.engine.game_map.actors:
-            if actor is not consumer and self.parent.game_map.visible[actor.x, actor.y]:
+            if actor is not consumer and self.engine.player.can_see(actor.x, actor.y):
                 distance = consumer.distance(actor.x, actor.y)
 
                 if distance < closest_distance:
@@ -37,14 +37,16 @@ class Fighter(ActorComponent):
     def die(self) -> None:
         self.parent.char = "%"
         self.parent.color = (191, 0, 0)
-        self.parent.blocks_movement = False
+        self.game_map.set_blocks_movement(self.parent, False)
         self.parent.ai = None
         self.parent.identity.name = f"remains of {self.parent.name}"
         self.parent.render_order = RenderOrder.CORPSE
         self.observations.add(
             "I am dead!",
             color.death,
+            importance=10,
         )
+        self.game_map.lifecycle.died(self.parent)
 
     def heal(self, amount: int) -> int:
         if self.hp == self.max_hp:
@@ -65,4 +67,4 @@ class Fighter(ActorComponent):
     def take_damage(self, amount: int) -> None:
         self._set_hp(self.hp - amount)
 
-        self.observations.add(text=f"I took damage! My HP decreased by {amount} to {self.hp}", event=None)
+        self.observations.add(text=f"I took damage! My HP decreased by {amount} to {self.hp}", event=None, importance=7)
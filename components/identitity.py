@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from enum import Enum, auto
-import random
 
 from components.base_component import ActorComponent
 from entity_kind import EntityKind
 from llm import generate_identitiy
+from rng import world
 
 # Define templates for each entity type
 orc_templates = ["Gor{con}", "Ug{con}{vow}k", "Gri{con}{vow}kh", "Lur{con}{vow}"]
@@ -29,11 +29,16 @@ class Identity(ActorComponent):
     def __init__(self, kind: EntityKind, name: str | None) -> None:
         super().__init__()
         self.name = name or self.generate_name(kind)
+        self.gender = Gender.UNKNOWN
         if kind == EntityKind.HUMAN or kind == EntityKind.PLAYER:
-            self.text = generate_identitiy("male", self.name)
+            self.text = f"I am {self.name}."  # Until the description is generated.
+            generate_identitiy("male", self.name, on_done=self.set_text)
         else:
             self.text = f"I am a {kind.name.lower()}."
 
+    def set_text(self, text: str) -> None:
+        self.text = text
+
         is_male = "[male]" in self.text
         is_female = "[female]" in self.text
 
@@ -49,17 +54,17 @@ class Identity(ActorComponent):
     def generate_name(self, kind: EntityKind) -> str:
         match kind.name:
             case "ORC":
-                template = random.choice(orc_templates)
+                template = world.choice(orc_templates)
             case "TROLL":
-                template = random.choice(troll_templates)
+                template = world.choice(troll_templates)
             case "HUMAN":
-                template = random.choice(human_templates)
+                template = world.choice(human_templates)
             case "WOLF":
-                template = random.choice(wolf_templates)
+                template = world.choice(wolf_templates)
             case _:
                 raise ValueError(f"Invalid entity kind {kind}")
 
-        name = template.format(con=random.choice(consonants), vow=random.choice(vowels))
+        name = template.format(con=world.choice(consonants), vow=world.choice(vowels))
         return name.capitalize()
 
     def update(self):
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from random import randint
 from typing import TYPE_CHECKING
 
 from components.base_component import BaseComponent
-from events import BuildingInteractEvent, building_interact_signal
+from events import BuildingInteractEvent
+from rng import world
 import actions
 import entity_factories
 
@@ -23,6 +23,11 @@ class Interactable(BaseComponent):
         """
         raise NotImplementedError()
 
+    def catch_up(self, ticks: int) -> None:
+        """Apply the updates missed while the building was dormant."""
+        for _ in range(ticks):
+            self.update()
+
 
 @dataclass
 class TreeInteractable(Interactable):
@@ -37,34 +42,36 @@ class TreeInteractable(Interactable):
     def update(self):
         self.current_energy = min(self.current_energy + 1, self.max_energy)
 
+    def catch_up(self, ticks: int) -> None:
+        self.current_energy = min(self.current_energy + ticks, self.max_energy)
+
     def interact(self, action: actions.BuildingInteractAction) -> None:
         engine = action.engine
         tree = self.parent
         actor = action.entity
         game_map = engine.game_map
 
-        building_interact_signal.send(
-            self,
-            event=BuildingInteractEvent(
+        game_map.event_bus.publish(
+            BuildingInteractEvent(
                 tree.x,
                 tree.y,
-                actor,
-                tree,
-            ),
+                actor.id,
+                tree.id,
+            )
         )
 
         if self.apples_on_tree == 0:
             return
 
-        apples_to_drop = randint(1, self.apples_on_tree)
+        apples_to_drop = world.randint(1, self.apples_on_tree)
         self.current_energy -= apples_to_drop * self.energy_for_apple
         attempts = apples_to_drop * 2
 
         while apples_to_drop > 0 and attempts > 0:
-            dx = randint(1, 3)
-            dy = randint(1, 3)
-            sx = randint(0, 1) * 2 - 1
-            sy = randint(0, 1) * 2 - 1
+            dx = world.randint(1, 3)
+            dy = world.randint(1, 3)
+            sx = world.randint(0, 1) * 2 - 1
+            sy = world.randint(0, 1) * 2 - 1
             x = tree.x + dx * sx
             y = tree.y + dy * sy
 
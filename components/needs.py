@@ -1,66 +1,164 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING
+
+from numpy.typing import NDArray
+import numpy as np
 
 from components.base_component import ActorComponent
-from entity import Actor
 
 if TYPE_CHECKING:
     from components.consumable import Food
+    from entity import Actor
+    from events import TickEvent
+
+# Columns of the NeedsSystem arrays.
+HUNGER, THIRST, SLEEPINESS, LONLINESS = range(4)
+
+# What an actor observes when a need reaches its maximum and whether it hurts.
+threshold_effects = [
+    ("I am starving!", True),
+    ("I am dying of thirst!", True),
+    ("I am extremely tired!", True),
+    ("I am extremely lonely!", False),
+]
+
+
+class NeedsSystem:
+    """Needs of many actors stored as rows of NumPy arrays.
+
+    All rows are advanced in one vectorized step, and Python code only runs for the actors
+    whose needs reached their maximum.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.values: NDArray[np.int32] = np.zeros((capacity, len(threshold_effects)), dtype=np.int32)
+        self.maxima: NDArray[np.int32] = np.zeros_like(self.values)
+        self.active: NDArray[np.bool_] = np.zeros(capacity, dtype=bool)
+        self.dormant: NDArray[np.bool_] = np.zeros(capacity, dtype=bool)  # Caught up by RegionActivity.
+        self.owners: list[Needs | None] = [None] * capacity
+
+    def add(self, needs: Needs, values: NDArray[np.int32], maxima: NDArray[np.int32]) -> int:
+        """Allocate a row for `needs` and return its index."""
+        free_rows = np.flatnonzero(~self.active)
+        if len(free_rows):
+            row = int(free_rows[0])
+        else:
+            row = len(self.active)
+            self._grow(2 * row)
+
+        self.values[row] = values
+        self.maxima[row] = maxima
+        self.active[row] = True
+        self.dormant[row] = False
+        self.owners[row] = needs
+        return row
+
+    def remove(self, row: int) -> None:
+        self.active[row] = False
+        self.dormant[row] = False
+        self.owners[row] = None
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - len(self.active)
+        self.values = np.concatenate([self.values, np.zeros((extra, self.values.shape[1]), dtype=np.int32)])
+        self.maxima = np.concatenate([self.maxima, np.zeros((extra, self.maxima.shape[1]), dtype=np.int32)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.dormant = np.concatenate([self.dormant, np.zeros(extra, dtype=bool)])
+        self.owners.extend([None] * extra)
+
+    # TODO it shall be possible to have different change rates for different creatures
+    def update(self, event: TickEvent) -> None:
+        """Advance every need which is not dormant by one tick."""
+        active = self.active & ~self.dormant
+        self.values[active] += 1
+
+        crossed = (self.values >= self.maxima) & active[:, np.newaxis]
+        np.minimum(self.values, self.maxima, out=self.values)
+
+        for row in np.flatnonzero(crossed.any(axis=1)):
+            for column in np.flatnonzero(crossed[row]):
+                self._threshold_effect(row, column, ticks=1)
+
+    def catch_up(self, rows: NDArray[np.intp], ticks: NDArray[np.int64]) -> None:
+        """Advance the needs of `rows` by the number of `ticks` each of them missed, in one step.
+
+        A need which was at its maximum for several ticks is observed once, with the damage of all of them.
+        """
+        values, maxima, ticks = self.values[rows], self.maxima[rows], ticks[:, np.newaxis]
+        # A need is at its maximum from the tick it reaches it on.
+        ticks_at_maximum = np.clip(ticks - np.maximum(maxima - values, 1) + 1, 0, ticks)
+        self.values[rows] = np.minimum(values + ticks, maxima)
+
+        for i, column in np.argwhere(ticks_at_maximum):
+            self._threshold_effect(rows[i], column, ticks=int(ticks_at_maximum[i, column]))
+
+    def _threshold_effect(self, row: int, column: int, ticks: int) -> None:
+        actor = self.owners[row].parent  # type: ignore[union-attr]
+        text, hurts = threshold_effects[column]
+        actor.observation_log.add(text=text, event=None, importance=7 if hurts else 5)
+        if hurts:
+            actor.fighter.take_damage(ticks)
+
+
+def _need(array: str, column: int) -> property:
+    def fget(needs: Needs) -> int:
+        return int(getattr(needs.system, array)[needs.row, column])
+
+    def fset(needs: Needs, value: int) -> None:
+        getattr(needs.system, array)[needs.row, column] = value
+
+    return property(fget, fset)
 
 
-@dataclass
 class Needs(ActorComponent):
+    """A view onto the row of a NeedsSystem which holds the needs of the parent actor."""
+
+    parent: Actor
+
     # Basic
-    max_hunger: int
-    max_thirst: int
-    max_sleepiness: int
+    hunger = _need("values", HUNGER)
+    thirst = _need("values", THIRST)
+    sleepiness = _need("values", SLEEPINESS)
+    max_hunger = _need("maxima", HUNGER)
+    max_thirst = _need("maxima", THIRST)
+    max_sleepiness = _need("maxima", SLEEPINESS)
 
     # Other
-    max_lonliness: int
-
-    hunger = 0
-    thirst = 0
-    sleepiness = 0
-    lonliness = 0
+    lonliness = _need("values", LONLINESS)
+    max_lonliness = _need("maxima", LONLINESS)
 
-    # TODO will be set later but is it ok to have dataclass?
-    parent: Actor = cast(Actor, None)
     # TODO how often does reflection happen?
     reflection = 10
 
+    def __init__(self, max_hunger: int, max_thirst: int, max_sleepiness: int, max_lonliness: int):
+        # Until the actor is placed on a map its needs live in a private system which never ticks.
+        self.system = NeedsSystem(capacity=1)
+        self.row = self.system.add(
+            self,
+            values=np.zeros(len(threshold_effects), dtype=np.int32),
+            maxima=np.array([max_hunger, max_thirst, max_sleepiness, max_lonliness], dtype=np.int32),
+        )
+
+    def attach(self, system: NeedsSystem) -> None:
+        """Move the needs into `system`, so they are advanced by it."""
+        if system is self.system:
+            return
+        row = system.add(self, self.system.values[self.row], self.system.maxima[self.row])
+        self.system.remove(self.row)
+        self.system, self.row = system, row
+
+    def detach(self) -> None:
+        self.attach(NeedsSystem(capacity=1))
+
     def report(self):
         return f"Hunger: {self.hunger}/{self.max_hunger},\
 Thirst: {self.thirst}/{self.max_thirst},\
 Sleepiness: {self.sleepiness}/{self.max_sleepiness},\
 Lonliness: {self.lonliness}/{self.max_lonliness}"
 
-    # TODO it shall be possible to have different change rates for different creatures
     def update(self):
-        self.hunger += 1
-        self.thirst += 1
-        self.sleepiness += 1
-        self.lonliness += 1
-
-        if self.hunger >= self.max_hunger:
-            self.parent.observation_log.add(text="I am starving!", event=None)
-            self.parent.fighter.take_damage(1)
-            self.hunger = self.max_hunger
-
-        if self.thirst >= self.max_thirst:
-            self.parent.observation_log.add(text="I am dying of thirst!", event=None)
-            self.parent.fighter.take_damage(1)
-            self.thirst = self.max_thirst
-
-        if self.sleepiness >= self.max_sleepiness:
-            self.parent.observation_log.add(text="I am extremely tired!", event=None)
-            self.parent.fighter.take_damage(1)
-            self.thirst = self.max_sleepiness
-
-        if self.lonliness >= self.max_lonliness:
-            self.parent.observation_log.add(text="I am extremely lonely!", event=None)
-            self.lonliness = self.max_lonliness
+        """Needs are advanced in bulk by NeedsSystem.update."""
 
     # TODO unify with hp etc.
     def eat(self, food: Food):
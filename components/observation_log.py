@@ -1,45 +1,68 @@
 from __future__ import annotations
 
-from collections.abc import Iterable, Reversible
+from collections import Counter, deque
+from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
+import sys
 import textwrap
 
-from chromadb.utils import embedding_functions  # type: ignore
+from numpy.typing import NDArray
+import numpy as np
 
 from components.base_component import BaseComponent
-from constants import chroma_client
-from env import openai_api_key
-from game_time import current_datetime
+from embeddings import VectorIndex, default_backend, top_k
+from events import (
+    AttackEvent,
+    BaseEvent,
+    BuildingInteractEvent,
+    DropEvent,
+    MoveEvent,
+    PickupEvent,
+    SpawnEvent,
+    UseEvent,
+)
+from game_time import current_tick, tick_datetime
 import color
 
 if TYPE_CHECKING:
-    from datetime import datetime
-
-    from chromadb.api.models.Collection import Collection  # type: ignore
     import tcod.console
 
+    from embeddings import EmbeddingBackend
     from entity import Actor
-    from events import BaseEvent
 
 # Global counter. Could be a static variable of Observation class but it would be easier to shot yourself in the foot.
 observation_id: int = 1
 
-_generate_embeddings = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=openai_api_key,
-)
+# Importance of observations on a scale from 1 to 10 by the type of their event.
+event_importance: dict[type[BaseEvent], float] = {
+    AttackEvent: 8,
+    SpawnEvent: 4,
+    UseEvent: 4,
+    BuildingInteractEvent: 4,
+    PickupEvent: 3,
+    DropEvent: 3,
+    MoveEvent: 1,
+}
+# Importance of observations without an event.
+default_importance = 3.0
+
+# Requests a summary of observations of the named actor and calls back with it, possibly later.
+Summarizer = Callable[[str, list["Observation"], Callable[[str], None]], None]
 
 
-@dataclass
+@dataclass(slots=True)
 class Observation:
-    """An observation made by an actor."""
+    """An observation made by an actor.
+
+    Its event is not kept, so old observations don't keep the entities of the event alive.
+    """
 
     text: str
-    event: BaseEvent | None
     fg: tuple[int, int, int] = color.white
-    gametime: datetime = field(default_factory=current_datetime)
+    tick: int = field(default_factory=current_tick)
     id: int = field(default_factory=lambda: Observation.get_id())
-    embedding: list[float] | None = None
+    embedding: NDArray[np.float32] | None = None
 
     @staticmethod
     def get_id() -> int:
@@ -48,29 +71,159 @@ class Observation:
         return observation_id
 
     def __str__(self) -> str:
-        formatted_datime = self.gametime.strftime("%y-%m-%d %H:%M")
+        formatted_datime = tick_datetime(self.tick).strftime("%y-%m-%d %H:%M")
         return f"[{formatted_datime}]: {self.text}"
 
 
+@dataclass(slots=True)
+class Summary:
+    """A summary of the observations made between two ticks."""
+
+    text: str
+    first_tick: int
+    last_tick: int
+
+    def __str__(self) -> str:
+        first = tick_datetime(self.first_tick).strftime("%y-%m-%d %H:%M")
+        last = tick_datetime(self.last_tick).strftime("%y-%m-%d %H:%M")
+        return f"[{first} - {last}]: {self.text}"
+
+
 class ObservationLog(BaseComponent):
+    """The last `capacity` observations of an actor, kept in a ring buffer.
+
+    Iterating yields the oldest observation first, `newest` yields the newest first. Ticks and
+    importance of observations are also kept in arrays by position in the buffer, for `retrieve`.
+
+    Every `summary_every` observations are condensed into a Summary, so what happened long ago is
+    still known in a bounded amount of text. The summary is extracted from the most important
+    observations right away and replaced by the one of `summarizer` when it arrives.
+    """
+
     parent: Actor
-    emb_collection: Collection | None = None
 
-    def __init__(self, capacity: int) -> None:
-        self.capacity = capacity
-        self.observations: list[Observation] = []
+    # Recency of an observation is multiplied by this every tick.
+    recency_decay = 0.995
+    # Weights of recency, importance and relevance in retrieval scores.
+    retrieval_weights = (1.0, 1.0, 1.0)
+    # Number of observations condensed into a summary, of summaries kept and of sentences in extracted ones.
+    summary_every = 64
+    max_summaries = 8
+    summary_sentences = 5
 
-    def add(self, text: str, fg: tuple[int, int, int] = color.white, event: BaseEvent | None = None) -> None:
+    def __init__(
+        self,
+        capacity: int,
+        embedding_backend: EmbeddingBackend | None = None,
+        summarizer: Summarizer | None = None,
+    ) -> None:
+        self.capacity = capacity
+        self._buffer: list[Observation | None] = [None] * capacity
+        self._start = 0  # Position of the oldest observation.
+        self._size = 0
+        self.ticks: NDArray[np.int64] = np.zeros(capacity, dtype=np.int64)
+        self.importance: NDArray[np.float32] = np.zeros(capacity, dtype=np.float32)
+        self.embedding_backend = embedding_backend or default_backend
+        self.index = VectorIndex(self.embedding_backend.dimensions)  # Ids are positions in the buffer.
+        self.summarizer = summarizer
+        self.summaries: deque[Summary] = deque(maxlen=self.max_summaries)
+        self._unsummarized = 0  # Number of the newest observations which are not summarized yet.
+
+    def add(
+        self,
+        text: str,
+        fg: tuple[int, int, int] = color.white,
+        event: BaseEvent | None = None,
+        importance: float | None = None,
+    ) -> None:
         """Add a observation to this log.
 
-        `text` is the message text, `fg` is the text color.
+        `text` is the message text, `fg` is the text color. `importance` is from 1 to 10, by default
+        it depends on the type of `event`.
         """
-        self.observations.append(Observation(text, event, fg))
+        if importance is None:
+            importance = event_importance.get(type(event), default_importance) if event else default_importance
+        # Most texts are repeated a lot, so all the copies can share one string.
+        self._append(Observation(sys.intern(text), fg), importance)
 
-        if len(self.observations) > self.capacity:
-            self.observations.pop(0)
+        self._unsummarized += 1
+        if self._unsummarized == min(self.summary_every, self.capacity):
+            self.summarize()
 
-        print(f"Add observation to {self.parent.name}: {text}")
+    def restore(
+        self, observations: Iterable[tuple[Observation, float]], summaries: Iterable[Summary], unsummarized: int
+    ) -> None:
+        """Fill an empty log with observations and their importance, e.g. from a save."""
+        for observation, importance in observations:
+            self._append(observation, importance)
+        self.summaries.extend(summaries)
+        self._unsummarized = unsummarized
+
+    def _append(self, observation: Observation, importance: float) -> None:
+        if self._size < self.capacity:
+            position = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            position = self._start
+            self._start = (self._start + 1) % self.capacity
+            self.index.remove(position)
+
+        self._buffer[position] = observation
+        self.ticks[position] = observation.tick
+        self.importance[position] = importance
+
+    def summarize(self) -> None:
+        """Condense the observations which are not summarized yet into a summary."""
+        positions = self._positions()[self._size - self._unsummarized :]
+        self._unsummarized = 0
+        if not len(positions):
+            return
+
+        observations: list[Observation] = [self._buffer[position] for position in positions]  # type: ignore[misc]
+        text = self._extract(observations, self.importance[positions])
+        summary = Summary(text, observations[0].tick, observations[-1].tick)
+        self.summaries.append(summary)
+        if self.summarizer:
+
+            def set_text(text: str) -> None:
+                summary.text = text
+
+            self.summarizer(self.parent.name, observations, set_text)
+
+    def _extract(self, observations: list[Observation], importance: NDArray[np.float32]) -> str:
+        """Deterministic summary: the most important distinct observations in the order they were made."""
+        counts = Counter(observation.text for observation in observations)
+        best: dict[str, float] = {}  # Text -> highest importance, in order of first appearance.
+        for observation, value in zip(observations, importance.tolist()):
+            best[observation.text] = max(best.get(observation.text, value), value)
+
+        ranked = sorted(best, key=lambda text: (-best[text], -counts[text]))[: self.summary_sentences]
+        return "; ".join(f"{text} (x{counts[text]})" if counts[text] > 1 else text for text in best if text in ranked)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def unsummarized(self) -> int:
+        """Number of the newest observations which are not summarized yet."""
+        return self._unsummarized
+
+    def __iter__(self) -> Iterator[Observation]:
+        for i in range(self._size):
+            yield self._buffer[(self._start + i) % self.capacity]  # type: ignore[misc]
+
+    def newest(self, skip: int = 0) -> Iterator[Observation]:
+        """Iterate from the newest observation to the oldest, leaving out the `skip` newest ones."""
+        for i in range(self._size - 1 - skip, -1, -1):
+            yield self._buffer[(self._start + i) % self.capacity]  # type: ignore[misc]
+
+    def importance_of_all(self) -> NDArray[np.float32]:
+        """Importance of every observation, the oldest first."""
+        return self.importance[self._positions()]
+
+    def _positions(self) -> NDArray[np.intp]:
+        """Positions of the observations in the buffer, the oldest first."""
+        return (self._start + np.arange(self._size)) % self.capacity
 
     def update(self) -> None:
         return super().update()
@@ -80,45 +233,52 @@ class ObservationLog(BaseComponent):
 
         It is supposed to be overloaded by agents.
         """
-        return str(self.observations)
+        return str(list(self))
 
     def make_embeddings(self) -> None:
-        """Generate embeddings for the observations in this log.
+        """Embed the observations which weren't embedded yet and add them to the index.
 
         Batched instead of on-the-fly generation for efficiency.
         """
-        if self.emb_collection is None:
-            self.emb_collection = chroma_client.create_collection(
-                name=f"{self.parent.name}_collection".lower() if self.parent else "sample_collection",
-                embedding_function=_generate_embeddings,
-            )
-
-        observations_without_embeddings = [
-            observation for observation in self.observations if observation.embedding is None
-        ]
+        pending = [int(position) for position in self._positions() if position not in self.index.rows]
+        if not pending:
+            return
 
-        embeddings = _generate_embeddings([observation.text for observation in observations_without_embeddings])
+        texts = [self._buffer[position].text for position in pending]  # type: ignore[union-attr]
+        embeddings = self.embedding_backend.embed(texts)
+        for position, embedding in zip(pending, embeddings):
+            self._buffer[position].embedding = embedding  # type: ignore[union-attr]
+        self.index.add(pending, embeddings)
 
-        self.emb_collection.add(
-            embeddings=embeddings,
-            documents=[str(observation) for observation in observations_without_embeddings],
-            ids=[str(observation.id) for observation in observations_without_embeddings],
-        )
-
-    # TODO probably it would make sense to properly store Observation objects in the database
     def query(self, text: str, amount: int = 1) -> list[str]:
-        if self.emb_collection is None:
-            self.make_embeddings()
-        assert self.emb_collection is not None
+        """Return the observations most similar to `text`, the most similar first."""
+        self.make_embeddings()
+        positions = self.index.top_k(self.embedding_backend.embed([text])[0], amount)
 
-        result = self.emb_collection.query(
-            query_embeddings=_generate_embeddings([text]),
-            n_results=amount,
-        )
+        return [str(self._buffer[position]) for position in positions]
 
-        print(f"Query {text} result: {result}")
+    def retrieve(self, query: str | None, amount: int) -> list[Observation]:
+        """Return the observations most worth remembering, the best first.
 
-        return result["documents"][0]  # type: ignore
+        As in 'Generative Agents', the score of an observation is the weighted sum of its recency,
+        importance and relevance to `query`, each scaled to [0, 1] over the log. Without a query only
+        recency and importance count.
+        """
+        positions = self._positions()
+        if not len(positions):
+            return []
+
+        recency_weight, importance_weight, relevance_weight = self.retrieval_weights
+        recency = self.recency_decay ** (current_tick() - self.ticks[positions]).astype(np.float32)
+        scores = recency_weight * _min_max(recency) + importance_weight * _min_max(self.importance[positions])
+        if query is not None:
+            self.make_embeddings()
+            relevance = np.zeros(self.capacity, dtype=np.float32)
+            ids, similarities = self.index.similarities(self.embedding_backend.embed([query])[0])
+            relevance[ids] = similarities
+            scores += relevance_weight * _min_max(relevance[positions])
+
+        return [self._buffer[position] for position in positions[top_k(scores, amount)]]  # type: ignore[misc]
 
     @staticmethod
     def wrap(string: str, width: int) -> Iterable[str]:
@@ -138,16 +298,16 @@ class ObservationLog(BaseComponent):
         y: int,
         width: int,
         height: int,
-        observations: Reversible[Observation],
+        newest_first: Iterable[Observation],
     ) -> None:
         """Render the observations provided.
 
-        The `messages` are rendered starting at the last message and working
-        backwards.
+        The observations are rendered from the bottom up, so `newest_first` is only iterated until
+        the area is full.
         """
         y_offset = height - 1
 
-        for observation in reversed(observations):
+        for observation in newest_first:
             for line in reversed(list(cls.wrap(str(observation), width))):
                 console.print(x=x, y=y + y_offset, string=line, fg=observation.fg)
                 y_offset -= 1
@@ -169,4 +329,11 @@ class ObservationLog(BaseComponent):
         `x`, `y`, `width`, `height` is the rectangular region to render onto
         the `console`.
         """
-        self.render_observations(console, x, y, width, height, self.observations)
+        self.render_observations(console, x, y, width, height, self.newest())
+
+
+def _min_max(values: NDArray[np.float32]) -> NDArray[np.float32]:
+    """Scale values to [0, 1]. Equal values are all scaled to 0."""
+    low = values.min()
+    spread = values.max() - low
+    return (values - low) / spread if spread > 0 else np.zeros_like(values)
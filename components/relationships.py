@@ -9,7 +9,7 @@ if TYPE_CHECKING:
 
 
 class Relationships(ActorComponent):
-    state: dict[str, int]
+    state: dict[int, int]  # By the ids of the other actors.
 
     def __init__(self) -> None:
         self.state = {}
@@ -21,8 +21,8 @@ class Relationships(ActorComponent):
 
         Returns True if a new relationship was added.
         """
-        if actor.name not in self.state:
-            self.state[actor.name] = 0
+        if actor.id not in self.state:
+            self.state[actor.id] = 0
             return True
         return False
 
@@ -30,4 +30,6 @@ class Relationships(ActorComponent):
         return super().update()
 
     def report(self):
-        return f"Relationships: {self.state}"
+        registry = self.game_map.registry
+        by_name = {registry.name_of(actor_id): value for actor_id, value in self.state.items()}
+        return f"Relationships: {by_name}"
@@ -1,9 +1,28 @@
-import chromadb  # type: ignore
-
 map_width = 160
 map_height = 100 + 3
 
+# Seed of the world. None picks a new one every game.
+world_seed: int | None = None
+# The actions of the player in new games are written to this file, so the game can be replayed with headless.py.
+action_log_path = "actions.jsonl"
+# Chunks of maps which are too large to be kept in memory are written to this directory.
+chunk_directory = "chunks"
+
+# Corpses decay this many ticks after the death. None keeps them forever.
+corpse_decay_ticks: int | None = 24 * 60
+
 # It will use hardcoded generatations where possible instead of querying llm.
 cost_saving_mode = True
 
-chroma_client = chromadb.Client()
+# Completions of the LLM are cached in this file.
+llm_cache_path = "llm_cache.sqlite3"
+# Fail instead of querying the LLM when a completion is not cached, for deterministic replays.
+llm_replay_only = False
+
+# Embed observations locally instead of with the OpenAI API.
+local_embeddings = True
+
+# Save the game every this many ticks. Only changes are written between full saves.
+autosave_every = 100
+# Compressor of saves. Saves which are not compressed ("none") are memory-mapped on load, which is fastest for big maps.
+save_compressor = "none"
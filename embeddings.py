@@ -1,36 +1,144 @@
-# ruff: noqa: E501
+from __future__ import annotations
 
-from chromadb.utils import embedding_functions  # type: ignore
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import TYPE_CHECKING
+import hashlib
 
-from components.observation_log import Observation
-from constants import chroma_client
-from env import openai_api_key
+from numpy.typing import NDArray
+import numpy as np
+import openai
 
-if __name__ == "__main__":
-    generate_embeddings = embedding_functions.OpenAIEmbeddingFunction(
-        api_key=openai_api_key,  # type: ignore
-    )
+from constants import local_embeddings
+
+if TYPE_CHECKING:
+    from typing import Any
+
+
+def normalize(vectors: NDArray[np.float32]) -> NDArray[np.float32]:
+    """Scale rows to unit length, so their dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+@lru_cache(maxsize=65536)
+def _feature(gram: str, dimensions: int) -> tuple[int, float]:
+    """Column and sign of an n-gram. Signs make collisions cancel out instead of adding up."""
+    digest = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little")
+    return digest % dimensions, 1.0 if digest >> 63 else -1.0
+
+
+class EmbeddingBackend(ABC):
+    dimensions: int
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> NDArray[np.float32]:
+        """Return an array of unit length embeddings, one row per text."""
+
+
+class HashingEmbedding(EmbeddingBackend):
+    """Local and deterministic embeddings: character n-grams of words hashed into a fixed-size vector.
+
+    Texts sharing words or parts of words end up close. It is far cruder than a language model, but
+    needs no network and is fast enough to embed every observation as it is made.
+    """
+
+    def __init__(self, dimensions: int = 256, ngram: int = 3):
+        self.dimensions = dimensions
+        self.ngram = ngram
+
+    def embed(self, texts: list[str]) -> NDArray[np.float32]:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = [_feature(gram, self.dimensions) for gram in self._ngrams(text)]
+            if features:
+                columns, signs = zip(*features)
+                np.add.at(vectors[row], list(columns), signs)
+        return normalize(vectors)
+
+    def _ngrams(self, text: str) -> list[str]:
+        grams = []
+        for word in text.lower().split():
+            word = f"<{word.strip('.,!?:;()[]')}>"
+            grams.append(word)
+            grams.extend(word[i : i + self.ngram] for i in range(len(word) - self.ngram + 1))
+        return grams
 
-    collection = chroma_client.create_collection(
-        name="sample_collection",
-        embedding_function=generate_embeddings,
-    )
 
-    example_observation = Observation("This is a test observation.", None)
-    important_observation = Observation("This is a important observation.", None)
-    duck_observation = Observation("I see a cute duck.", None)
+class OpenAIEmbedding(EmbeddingBackend):
+    dimensions = 1536
 
-    obs_texts = [example_observation.text, important_observation.text, duck_observation.text]
+    def __init__(self, model: str = "text-embedding-ada-002"):
+        self.model = model
 
-    collection.add(
-        embeddings=generate_embeddings(obs_texts),
-        documents=obs_texts,
-        ids=["1", "2", "3"],
-    )
+    def embed(self, texts: list[str]) -> NDArray[np.float32]:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        response: Any = openai.Embedding.create(model=self.model, input=texts)
+        return normalize(np.array([item["embedding"] for item in response["data"]], dtype=np.float32))
 
-    results = collection.query(
-        query_embeddings=generate_embeddings(["Something about ducks", "Important stuff"]),
-        n_results=1,
-    )
 
-    print(f"Results: {results}")
+class VectorIndex:
+    """Unit vectors with integer ids, searched by cosine similarity with one matrix product."""
+
+    def __init__(self, dimensions: int, capacity: int = 64):
+        self.vectors: NDArray[np.float32] = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.ids: NDArray[np.int64] = np.zeros(capacity, dtype=np.int64)
+        self.rows: dict[int, int] = {}  # Id -> row.
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, ids: list[int], vectors: NDArray[np.float32]) -> None:
+        size = len(self.rows)
+        if size + len(ids) > len(self.ids):
+            capacity = max(2 * len(self.ids), size + len(ids))
+            self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+            self.ids = np.resize(self.ids, capacity)
+        self.vectors[size : size + len(ids)] = vectors
+        self.ids[size : size + len(ids)] = ids
+        self.rows.update(zip(ids, range(size, size + len(ids))))
+
+    def remove(self, id: int) -> None:
+        """Remove a vector by moving the last one into its row."""
+        row = self.rows.pop(id, None)
+        if row is None:
+            return
+        last = len(self.rows)
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = self.ids[last]
+            self.rows[int(self.ids[row])] = row
+
+    def similarities(self, vector: NDArray[np.float32]) -> tuple[NDArray[np.int64], NDArray[np.float32]]:
+        """Return the ids of all vectors and their cosine similarities to `vector`."""
+        size = len(self.rows)
+        return self.ids[:size], self.vectors[:size] @ vector
+
+    def top_k(self, vector: NDArray[np.float32], k: int) -> list[int]:
+        """Return the ids of the `k` most similar vectors, the most similar first."""
+        ids, similarities = self.similarities(vector)
+        return ids[top_k(similarities, k)].tolist()
+
+
+def top_k(scores: NDArray[np.floating], k: int) -> NDArray[np.intp]:
+    """Return the indices of the `k` highest scores, the highest first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+# Backend of observation logs which weren't given one.
+default_backend: EmbeddingBackend = HashingEmbedding() if local_embeddings else OpenAIEmbedding()
+
+
+if __name__ == "__main__":
+    backend = HashingEmbedding()
+    texts = ["This is a test observation.", "This is a important observation.", "I see a cute duck."]
+    index = VectorIndex(backend.dimensions)
+    index.add([1, 2, 3], backend.embed(texts))
+
+    for query in ["Something about ducks", "Important stuff"]:
+        print(f"{query}: {texts[index.top_k(backend.embed([query])[0], 1)[0] - 1]}")
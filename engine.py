@@ -1,8 +1,6 @@
 from __future__ import annotations
 
 from typing import TYPE_CHECKING
-import lzma
-import pickle
 
 from tcod.console import Console
 
@@ -14,6 +12,8 @@ if TYPE_CHECKING:
     from entity import IntelligentActor
     from events import BaseMapEvent
     from game_map import GameMap
+    from replay import ActionLog
+    from savefile import Autosave
 
 
 class Engine:
@@ -23,6 +23,8 @@ class Engine:
     def __init__(self, player: IntelligentActor):
         self.mouse_location = (0, 0)
         self.player = player
+        self.autosave: Autosave | None = None  # The scheduler only keeps a weak reference to it.
+        self.action_log: ActionLog | None = None
 
     def render(self, console: Console) -> None:
         self.game_map.render(console)
@@ -38,12 +40,6 @@ class Engine:
 
         render_names_at_mouse_location(console=console, x=21, y=constants.map_height + 1, engine=self)
 
-    def save_as(self, filename: str) -> None:
-        """Save this Engine instance as a compressed file."""
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
-
     def add_observation(
         self, observation: str, fg: tuple[int, int, int] = color.white, event: BaseMapEvent | None = None
     ):
@@ -1,24 +1,22 @@
 from __future__ import annotations
 
-from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, TypeVar
+from abc import ABC
+from typing import TYPE_CHECKING, TypeVar
 import math
 
-from tcod.map import compute_fov
+from numpy.typing import NDArray
 import numpy as np
 
 from components.identitity import Identity
 from components.relationships import Relationships
 from entity_kind import EntityKind
-from events import AttackEvent, BaseMapEvent, MoveEvent, TickEvent
+from events import AttackEvent, BaseMapEvent, MoveEvent
 from exceptions import Impossible
-from game_time import tick_signal
+from game_time import ACTION_COST
+from registry import NO_ID
 from render_order import RenderOrder
-import constants
 
 if TYPE_CHECKING:
-    from blinker import Signal
-
     from components.ai import BaseAI, IntelligentCreature
     from components.consumable import Consumable
     from components.fighter import Fighter
@@ -51,7 +49,9 @@ class Entity(ABC):
         kind: EntityKind = EntityKind.UNKNOWN,
         blocks_movement: bool = False,
         render_order: RenderOrder = RenderOrder.CORPSE,
+        identity: Identity | None = None,
     ):
+        self.id = NO_ID  # Given by the EntityRegistry of the first map the entity is put on.
         self.x = x
         self.y = y
         self.char = char
@@ -59,13 +59,10 @@ class Entity(ABC):
         self.kind = kind
         self.blocks_movement = blocks_movement
         self.render_order = render_order
-        self.identity = Identity(kind, name)
+        self.identity = identity or Identity(kind, name)
         if parent:
             # If parent isn't provided now then it will be set later.
-            self.parent = parent
-            parent.entities.add(self)
-
-        tick_signal.connect(receiver=self.tick)
+            parent.add_entity(self)
 
     @property
     def game_map(self) -> GameMap:
@@ -79,20 +76,20 @@ class Entity(ABC):
     def full_name(self) -> str:
         return f"{self.name} ({self.kind.name})"
 
-    @abstractmethod
-    def tick(self, _sender: Any, event: TickEvent) -> None:
-        """Called every tick. It should update all components."""
-
     def place(self, x: int, y: int, game_map: GameMap | None = None) -> None:
         """Place this entitiy at a new location.  Handles moving across GameMaps."""
-        self.x = x
-        self.y = y
+        on_map = hasattr(self, "parent") and self.parent is self.game_map  # Parent is possibly uninitialized.
         if game_map:
-            if hasattr(self, "parent"):  # Possibly uninitialized.
-                if self.parent is self.game_map:
-                    self.game_map.entities.remove(self)
-            self.parent = game_map
-            game_map.entities.add(self)
+            if on_map:
+                self.game_map.remove_entity(self)
+            self.x = x
+            self.y = y
+            game_map.add_entity(self)
+        elif on_map:
+            self.game_map.move_entity(self, x, y)
+        else:
+            self.x = x
+            self.y = y
 
     def distance(self, x: int, y: int) -> float:
         """
@@ -102,8 +99,7 @@ class Entity(ABC):
 
     def move(self, dx: int, dy: int) -> None:
         # Move the entity by a given amount
-        self.x += dx
-        self.y += dy
+        self.game_map.move_entity(self, self.x + dx, self.y + dy)
 
     def __str__(self):
         return f"{self.name} ({self.kind.name})"
@@ -126,8 +122,9 @@ class Actor(Entity):
         stats: Stats,
         observation_log: ObservationLog,
         relationships: Relationships,
-        signals_to_listen: list[Signal],
+        observed_events: tuple[type[BaseMapEvent], ...] = (),
         eyesight: int = 8,
+        speed: int = ACTION_COST,
     ):
         super().__init__(
             x=x,
@@ -162,39 +159,33 @@ class Actor(Entity):
 
         self.identity.parent = self
 
-        self.visible = np.full(
-            (constants.map_width, constants.map_height), fill_value=False, order="F"
-        )  # Tiles the actor can currently see.
-        self.explored = np.full(
-            (constants.map_width, constants.map_height), fill_value=False, order="F"
-        )  # Tiles the actor has seen before.
-
         self.eyesight = eyesight
 
-        for signal in signals_to_listen:
-            signal.connect(self.handle_event)
+        self.speed = speed  # Energy gained per tick, see TurnQueue.
+        self.energy = 0
 
-    def _update_fov(self) -> None:
-        self.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.x, self.y),
-            radius=self.eyesight,
-        )
+        self.observed_events = observed_events  # Delivered by the EventBus of the map, where the actor can see.
 
-        self.explored |= self.visible
+    @property
+    def visible(self) -> NDArray[np.bool_]:
+        """Tiles the actor can currently see."""
+        return self.game_map.fov.visible(self)
 
-    def tick(self, _sender: Any, event: TickEvent) -> None:
-        # Make ai take its turn.
-        # TODO a hack but ok for now
-        if self.char != "@" and self.ai:
-            try:
-                self.ai.perform()
-            except Impossible:
-                pass  # Ignore impossible action exceptions from AI.
+    @property
+    def explored(self) -> NDArray[np.bool_]:
+        """Tiles the actor has seen before."""
+        return self.game_map.fov.explored(self)
 
-        self._update_fov()
+    def _update_fov(self) -> None:
+        """Usually FOV is updated for all actors at once by FOVSystem."""
+        self.game_map.fov.compute(self)
 
-        self.needs.update()
+    def take_turn(self) -> None:
+        """Make ai take its turn."""
+        try:
+            self.ai.perform()  # type: ignore[union-attr]
+        except Impossible:
+            pass  # Ignore impossible action exceptions from AI.
 
     @property
     def is_alive(self) -> bool:
@@ -202,20 +193,21 @@ class Actor(Entity):
         return bool(self.ai)
 
     def can_see(self, target_x: int, target_y: int) -> bool:
-        return self.is_alive and self.visible[target_x, target_y]
+        return self.is_alive and self.game_map.fov.is_visible(self, target_x, target_y)
 
-    def handle_event(self, _sender: Any, event: BaseMapEvent):
+    def handle_event(self, event: BaseMapEvent):
         if not self.can_see(event.x, event.y):
             return
         # print(f"{self.name} observes {event}")
+        registry = self.game_map.registry
         match event:
-            case AttackEvent(_, _, actor, target):
-                if actor == self:
-                    self.observation_log.add(f"I attacked {target.full_name}", event=event)
-                if target == self:
-                    self.observation_log.add(f"I was attacked by {actor.full_name}", event=event)
-            case MoveEvent(_, _, actor, dx, dy):
-                print(f"{actor.name} moved by ({dx}, {dy})")
+            case AttackEvent(_, _, actor_id, target_id):
+                if actor_id == self.id:
+                    self.observation_log.add(f"I attacked {registry.name_of(target_id)}", event=event)
+                if target_id == self.id:
+                    self.observation_log.add(f"I was attacked by {registry.name_of(actor_id)}", event=event)
+            case MoveEvent(_, _, actor_id, dx, dy):
+                print(f"{registry.name_of(actor_id)} moved by ({dx}, {dy})")
             case _:
                 print("Unknown event type")
 
@@ -251,9 +243,6 @@ class Item(Entity):
         self.consumable = consumable
         self.consumable.parent = self
 
-    def tick(self, _sender: Any, event: TickEvent) -> None:
-        pass
-
 
 class Building(Entity):
     def __init__(
@@ -280,5 +269,20 @@ class Building(Entity):
         self.interactable = interactable
         self.interactable.parent = self
 
-    def tick(self, _sender: Any, event: TickEvent) -> None:
-        self.interactable.update()
+
+class Corpse(Entity):
+    """What is left of a dead actor. It only keeps the identity of the actor, see Lifecycle."""
+
+    def __init__(self, *, x: int = 0, y: int = 0, identity: Identity, kind: EntityKind, died_at: int):
+        super().__init__(
+            x=x,
+            y=y,
+            char="%",
+            color=(191, 0, 0),
+            kind=kind,
+            blocks_movement=False,
+            render_order=RenderOrder.CORPSE,
+            identity=identity,
+        )
+        self.identity.parent = self  # type: ignore[assignment]
+        self.died_at = died_at  # Tick of the death.
@@ -1,10 +1,8 @@
 from datetime import timedelta
-from random import randint
 
-from components import consumable
+from components import consumable, interactable
 from components.ai import AutoExploreAI, HostileEnemy, RandomActingHuman
 from components.fighter import Fighter
-from components.interactable import TreeInteractable
 from components.inventory import Inventory
 from components.needs import Needs
 from components.observation_log import ObservationLog
@@ -12,10 +10,10 @@ from components.relationships import Relationships
 from components.stats import Stats
 from entity import Actor, Building, IntelligentActor, Item
 from entity_kind import EntityKind
-from events import attack_signal, drop_signal, move_signal, pickup_signal, spawn_signal
+from events import visible_events
 from game_map import GameMap
-
-visible_signals = [spawn_signal, attack_signal, pickup_signal, move_signal, drop_signal]
+from llm import generate_summary
+from rng import world
 
 
 def create_player(x: int = 0, y: int = 0) -> IntelligentActor:
@@ -34,9 +32,9 @@ def create_player(x: int = 0, y: int = 0) -> IntelligentActor:
         inventory=Inventory(capacity=26),
         needs=Needs(max_hunger=500, max_thirst=500, max_sleepiness=1000, max_lonliness=1000),
         stats=Stats(age=timedelta(days=20 * 365), intelligence=10, strength=10, dexterity=10, stamina=10),
-        observation_log=ObservationLog(capacity=1024),
+        observation_log=ObservationLog(capacity=1024, summarizer=generate_summary),
         relationships=Relationships(),
-        signals_to_listen=visible_signals,
+        observed_events=visible_events,
     )
 
 
@@ -51,21 +49,21 @@ def spawn_human(game_map: GameMap, x: int, y: int) -> IntelligentActor:
         fighter=Fighter(hp=10, defense=0, power=3),
         inventory=Inventory(capacity=0),
         needs=Needs(
-            max_hunger=randint(80, 120) * 5,
-            max_thirst=randint(80, 120) * 5,
-            max_sleepiness=randint(800, 1200),
+            max_hunger=world.randint(80, 120) * 5,
+            max_thirst=world.randint(80, 120) * 5,
+            max_sleepiness=world.randint(800, 1200),
             max_lonliness=1000,
         ),
         stats=Stats(
-            age=timedelta(days=randint(15, 60) * 365),
-            intelligence=randint(1, 13),
-            strength=randint(3, 15),
-            dexterity=randint(3, 15),
-            stamina=randint(3, 15),
+            age=timedelta(days=world.randint(15, 60) * 365),
+            intelligence=world.randint(1, 13),
+            strength=world.randint(3, 15),
+            dexterity=world.randint(3, 15),
+            stamina=world.randint(3, 15),
         ),
-        observation_log=ObservationLog(capacity=512),
+        observation_log=ObservationLog(capacity=512, summarizer=generate_summary),
         relationships=Relationships(),
-        signals_to_listen=visible_signals,
+        observed_events=visible_events,
     )
     game_map.spawn(human)
     return human
@@ -82,21 +80,21 @@ def spawn_smart_human(game_map: GameMap, x: int, y: int) -> IntelligentActor:
         fighter=Fighter(hp=10, defense=0, power=3),
         inventory=Inventory(capacity=0),
         needs=Needs(
-            max_hunger=randint(80, 120) * 5,
-            max_thirst=randint(80, 120) * 5,
-            max_sleepiness=randint(800, 1200),
+            max_hunger=world.randint(80, 120) * 5,
+            max_thirst=world.randint(80, 120) * 5,
+            max_sleepiness=world.randint(800, 1200),
             max_lonliness=1000,
         ),
         stats=Stats(
-            age=timedelta(days=randint(15, 60) * 365),
-            intelligence=randint(1, 13),
-            strength=randint(3, 15),
-            dexterity=randint(3, 15),
-            stamina=randint(3, 15),
+            age=timedelta(days=world.randint(15, 60) * 365),
+            intelligence=world.randint(1, 13),
+            strength=world.randint(3, 15),
+            dexterity=world.randint(3, 15),
+            stamina=world.randint(3, 15),
         ),
-        observation_log=ObservationLog(capacity=512),
+        observation_log=ObservationLog(capacity=512, summarizer=generate_summary),
         relationships=Relationships(),
-        signals_to_listen=visible_signals,
+        observed_events=visible_events,
     )
     game_map.spawn(human)
     return human
@@ -116,21 +114,21 @@ def spawn_orc(game_map: GameMap, x: int, y: int):
         fighter=Fighter(hp=10, defense=0, power=3),
         inventory=Inventory(capacity=0),
         needs=Needs(
-            max_hunger=randint(70, 100),
-            max_thirst=randint(100, 200),
-            max_sleepiness=randint(1500, 2000),
+            max_hunger=world.randint(70, 100),
+            max_thirst=world.randint(100, 200),
+            max_sleepiness=world.randint(1500, 2000),
             max_lonliness=800,
         ),
         stats=Stats(
-            age=timedelta(days=randint(14, 40) * 365),
-            intelligence=randint(1, 8),
-            strength=randint(5, 17),
-            dexterity=randint(3, 12),
-            stamina=randint(5, 17),
+            age=timedelta(days=world.randint(14, 40) * 365),
+            intelligence=world.randint(1, 8),
+            strength=world.randint(5, 17),
+            dexterity=world.randint(3, 12),
+            stamina=world.randint(5, 17),
         ),
         observation_log=ObservationLog(capacity=512),
         relationships=Relationships(),
-        signals_to_listen=visible_signals,
+        observed_events=visible_events,
     )
     game_map.spawn(orc)
     return orc
@@ -147,21 +145,21 @@ def spawn_troll(game_map: GameMap, x: int, y: int):
         fighter=Fighter(hp=16, defense=1, power=4),
         inventory=Inventory(capacity=0),
         needs=Needs(
-            max_hunger=randint(50, 80),
-            max_thirst=randint(300, 800),
-            max_sleepiness=randint(3500, 5000),
+            max_hunger=world.randint(50, 80),
+            max_thirst=world.randint(300, 800),
+            max_sleepiness=world.randint(3500, 5000),
             max_lonliness=3000,
         ),
         stats=Stats(
-            age=timedelta(days=randint(14, 40) * 365),
-            intelligence=randint(1, 8),
-            strength=randint(10, 25),
-            dexterity=randint(1, 5),
-            stamina=randint(10, 30),
+            age=timedelta(days=world.randint(14, 40) * 365),
+            intelligence=world.randint(1, 8),
+            strength=world.randint(10, 25),
+            dexterity=world.randint(1, 5),
+            stamina=world.randint(10, 30),
         ),
         observation_log=ObservationLog(capacity=256),
         relationships=Relationships(),
-        signals_to_listen=visible_signals,
+        observed_events=visible_events,
     )
     game_map.spawn(troll)
     return troll
@@ -238,7 +236,7 @@ def spawn_tree(game_map: GameMap, x: int, y: int):
         char="T",
         color=(255, 255, 255),
         name="Tree",
-        interactable=TreeInteractable(),
+        interactable=interactable.TreeInteractable(),
     )
 
     game_map.spawn(entity=tree)
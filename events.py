@@ -1,75 +1,202 @@
 from __future__ import annotations
 
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, overload
 
-from blinker import Signal
+from numpy.typing import NDArray
+import numpy as np
 
 if TYPE_CHECKING:
-    from entity import Actor, Building, Entity, Item
+    from entity import Actor
+    from game_map import Area
+
+# Size of the square cells in which EventBus keeps its subscribers.
+CELL_SIZE = 16
 
 
 class BaseEvent:
-    pass
+    """Events are immutable and slotted, so they are cheap to create and can be shared by all observers."""
+
+    __slots__ = ()
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TickEvent(BaseEvent):
     time: datetime
+    tick: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BaseMapEvent(BaseEvent):
+    """An event at (x, y) of a map. Entities are referred to by their ids in the EntityRegistry of the map."""
+
     x: int
     y: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ActorEvent(BaseMapEvent):
-    actor: Actor
+    actor_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SpawnEvent(BaseMapEvent):
-    entity: Entity
+    entity_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AttackEvent(ActorEvent):
-    target: Actor
+    target_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PickupEvent(ActorEvent):
-    item: Actor
+    item_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DropEvent(ActorEvent):
-    item: Item
+    item_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UseEvent(ActorEvent):
-    item: Actor
+    item_id: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MoveEvent(ActorEvent):
     dx: int
     dy: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BuildingInteractEvent(ActorEvent):
-    building: Building
-
-
-spawn_signal = Signal("spawn")
-attack_signal = Signal("attack")
-pickup_signal = Signal("pickup")
-drop_signal = Signal("drop")
-use_signal = Signal("use")
-move_signal = Signal("move")
-building_interact_signal = Signal("building_interact")
+    building_id: int
+
+
+# Events actors can see happen around them.
+visible_events: tuple[type[BaseMapEvent], ...] = (SpawnEvent, AttackEvent, PickupEvent, MoveEvent, DropEvent)
+# Every type of map events. Batches store the index of the type of each event.
+map_event_types: list[type[BaseMapEvent]] = [
+    SpawnEvent,
+    AttackEvent,
+    PickupEvent,
+    DropEvent,
+    UseEvent,
+    MoveEvent,
+    BuildingInteractEvent,
+]
+_type_codes = {event_type: code for code, event_type in enumerate(map_event_types)}
+
+
+class EventBatch(Sequence[BaseMapEvent]):
+    """The events of a map published during one tick, in the order they were published.
+
+    Besides the events themselves, the index of their type in `map_event_types` and their location are
+    kept as arrays, so consumers can count and filter the events of a tick without visiting each of them.
+    """
+
+    def __init__(self, tick: int, events: list[BaseMapEvent], types: list[int], xs: list[int], ys: list[int]):
+        self.tick = tick
+        self.events = events
+        self.types: NDArray[np.uint8] = np.array(types, dtype=np.uint8)
+        self.x: NDArray[np.int32] = np.array(xs, dtype=np.int32)
+        self.y: NDArray[np.int32] = np.array(ys, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    @overload
+    def __getitem__(self, index: int) -> BaseMapEvent:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[BaseMapEvent]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> BaseMapEvent | list[BaseMapEvent]:
+        return self.events[index]
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of events of every type in the batch, by the name of the type."""
+        counts = np.bincount(self.types, minlength=len(map_event_types)).tolist()
+        return {event_type.__name__: count for event_type, count in zip(map_event_types, counts) if count}
+
+
+class EventBus:
+    """Delivers the events of a map to the actors which watch where they happen.
+
+    Every actor watches the area of its FOV, for the types of events in `actor.observed_events`.
+    Subscribers are kept by event type and by the cells of CELL_SIZE tiles their areas overlap, so an
+    event only reaches the actors around it. Events are queued as they are published, so that observers
+    never run in the middle of another actor's turn, and delivered in one pass at the end of the tick,
+    by which time the FOV of the actors is up to date. The whole batch is then passed to `consumers`.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: dict[tuple[type[BaseMapEvent], int, int], dict[Actor, None]] = {}  # Used as ordered sets.
+        self.watched: dict[Actor, set[tuple[int, int]]] = {}  # Cells every actor watches.
+        self.consumers: list[Callable[[EventBatch], None]] = []
+        # The queue of the current tick, as columns of an EventBatch.
+        self.pending: list[BaseMapEvent] = []
+        self._types: list[int] = []
+        self._xs: list[int] = []
+        self._ys: list[int] = []
+
+    def watch(self, actor: Actor, area: Area) -> None:
+        """Deliver the events the actor observes in `area` to it, instead of those in the area it watched."""
+        x0, y0, x1, y1 = area
+        cells = {
+            (cx, cy)
+            for cx in range(x0 // CELL_SIZE, (x1 - 1) // CELL_SIZE + 1)
+            for cy in range(y0 // CELL_SIZE, (y1 - 1) // CELL_SIZE + 1)
+        }
+        watched = self.watched.get(actor, set())
+        if cells == watched:
+            return
+        self._unsubscribe(actor, watched - cells)
+        for event_type in actor.observed_events:
+            for cx, cy in cells - watched:
+                self.subscribers.setdefault((event_type, cx, cy), {})[actor] = None
+        self.watched[actor] = cells
+
+    def unwatch(self, actor: Actor) -> None:
+        self._unsubscribe(actor, self.watched.pop(actor, set()))
+
+    def _unsubscribe(self, actor: Actor, cells: set[tuple[int, int]]) -> None:
+        for event_type in actor.observed_events:
+            for cx, cy in cells:
+                key = event_type, cx, cy
+                subscribers = self.subscribers[key]
+                del subscribers[actor]
+                if not subscribers:
+                    del self.subscribers[key]
+
+    def publish(self, event: BaseMapEvent) -> None:
+        self.pending.append(event)
+        self._types.append(_type_codes[type(event)])
+        self._xs.append(event.x)
+        self._ys.append(event.y)
+
+    def take_batch(self, tick: int) -> EventBatch:
+        """Return the queued events and empty the queue."""
+        batch = EventBatch(tick, self.pending, self._types, self._xs, self._ys)
+        self.pending, self._types, self._xs, self._ys = [], [], [], []
+        return batch
+
+    def deliver(self, event: TickEvent) -> None:
+        """Deliver the events published during the tick, in the order they were published.
+
+        Events published by observers are delivered with the events of the next tick.
+        """
+        batch = self.take_batch(event.tick)
+        for map_event in batch:
+            key = type(map_event), map_event.x // CELL_SIZE, map_event.y // CELL_SIZE
+            for actor in list(self.subscribers.get(key, ())):
+                actor.handle_event(map_event)
+
+        for consumer in self.consumers:
+            consumer(batch)
@@ -7,3 +7,11 @@ class Impossible(Exception):
 
 class QuitWithoutSaving(SystemExit):
     """Can be raised to exit the game without automatically saving."""
+
+
+class ReplayCacheMiss(Exception):
+    """Raised in replay-only mode when a completion is not in the cache."""
+
+
+class ReplayDiverged(Exception):
+    """Raised when a replayed run does not follow its action log."""
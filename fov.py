@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from numpy.typing import NDArray
+from tcod.map import compute_fov
+import numpy as np
+
+from chunks import ChunkedExplored
+
+if TYPE_CHECKING:
+    from entity import Actor
+    from events import TickEvent
+    from game_map import Area, ChunkedGameMap, GameMap
+
+
+class View:
+    """What a single actor currently sees.
+
+    `visible` only covers the window of the map within the actor's eyesight, starting at `origin`.
+    """
+
+    __slots__ = ("row", "origin", "visible", "position", "transparency")
+
+    def __init__(self, row: int):
+        self.row = row  # Row of the actor in the explored tiles of its BaseFOVSystem.
+        self.origin = (0, 0)
+        self.visible: NDArray[np.bool_] = np.zeros((0, 0), dtype=bool)
+        # Inputs of the last computation, used to skip it when nothing changed.
+        self.position: tuple[int, int, int] | None = None
+        self.transparency: NDArray[np.bool_] | None = None
+
+
+class BaseFOVSystem(ABC):
+    """Field of view of every actor on a map, computed in one pass per tick.
+
+    FOV is only computed inside the window an actor's eyesight can reach, and not at all if neither
+    the actor nor the transparency of that window changed since the last time. Subclasses store the
+    tiles every actor explored, in a row per actor.
+    """
+
+    def __init__(self, game_map: GameMap, capacity: int = 64):
+        self.game_map = game_map
+        self.views: dict[Actor, View] = {}
+        self._free_rows = list(range(capacity - 1, -1, -1))
+
+    @property
+    @abstractmethod
+    def capacity(self) -> int:
+        """Number of rows of explored tiles."""
+
+    def add(self, actor: Actor) -> None:
+        if not self._free_rows:
+            capacity = self.capacity
+            self._grow(2 * capacity)
+            self._free_rows = list(range(2 * capacity - 1, capacity - 1, -1))
+        self.views[actor] = View(self._free_rows.pop())
+
+    def remove(self, actor: Actor) -> None:
+        """Forget what the actor saw. Explored tiles are remembered per map."""
+        view = self.views.pop(actor)
+        self._forget(view.row)
+        self._free_rows.append(view.row)
+
+    @abstractmethod
+    def _grow(self, capacity: int) -> None:
+        """Make room for `capacity` rows of explored tiles."""
+
+    @abstractmethod
+    def _forget(self, row: int) -> None:
+        """Clear a row of explored tiles."""
+
+    def update(self, event: TickEvent) -> None:
+        dormant = self.game_map.regions.dormant
+        for actor in self.views:
+            if actor.is_alive and actor not in dormant:
+                self.compute(actor)
+
+    def compute(self, actor: Actor) -> None:
+        view = self.views[actor]
+        radius = actor.eyesight
+        x0, y0 = max(0, actor.x - radius), max(0, actor.y - radius)
+        x1, y1 = min(self.game_map.width, actor.x + radius + 1), min(self.game_map.height, actor.y + radius + 1)
+        transparency = self.game_map.window((x0, y0, x1, y1))["transparent"]
+
+        position = (actor.x, actor.y, radius)
+        if position == view.position and np.array_equal(transparency, view.transparency):
+            return  # Nothing the actor could see has changed.
+
+        view.position = position
+        view.transparency = transparency.copy()
+        view.origin = (x0, y0)
+        view.visible = compute_fov(transparency, (actor.x - x0, actor.y - y0), radius=radius)
+        self.game_map.event_bus.watch(actor, (x0, y0, x1, y1))
+        self._explore(view.row, x0, y0, view.visible)
+
+    @abstractmethod
+    def _explore(self, row: int, x0: int, y0: int, visible: NDArray[np.bool_]) -> None:
+        """Mark the tiles of `visible`, a window of the map at (x0, y0), as explored in `row`."""
+
+    def is_visible(self, actor: Actor, x: int, y: int) -> bool:
+        view = self.views[actor]
+        x -= view.origin[0]
+        y -= view.origin[1]
+        return 0 <= x < view.visible.shape[0] and 0 <= y < view.visible.shape[1] and bool(view.visible[x, y])
+
+    def visible(self, actor: Actor, area: Area | None = None) -> NDArray[np.bool_]:
+        """Return the tiles of `area`, by default the whole map, which the actor currently sees."""
+        x0, y0, x1, y1 = area or self.game_map.area
+        view = self.views[actor]
+        result = np.zeros((x1 - x0, y1 - y0), dtype=bool, order="F")
+        x, y = view.origin
+        width, height = view.visible.shape
+        # Part of the view inside the area.
+        left, top = max(x, x0), max(y, y0)
+        right, bottom = min(x + width, x1), min(y + height, y1)
+        if left < right and top < bottom:
+            part = view.visible[left - x : right - x, top - y : bottom - y]
+            result[left - x0 : right - x0, top - y0 : bottom - y0] = part
+        return result
+
+    @abstractmethod
+    def explored(self, actor: Actor, area: Area | None = None) -> NDArray[np.bool_]:
+        """Return the tiles of `area`, by default the whole map, which the actor has seen before."""
+
+
+class FOVSystem(BaseFOVSystem):
+    """BaseFOVSystem of a map which fits in memory. Explored tiles are stored as packed bits."""
+
+    def __init__(self, game_map: GameMap, capacity: int = 64):
+        super().__init__(game_map, capacity)
+        self.explored_bits: NDArray[np.uint8] = np.zeros(
+            (capacity, game_map.width, (game_map.height + 7) // 8), dtype=np.uint8
+        )
+
+    @property
+    def capacity(self) -> int:
+        return len(self.explored_bits)
+
+    def _grow(self, capacity: int) -> None:
+        self.explored_bits = np.concatenate([self.explored_bits, np.zeros_like(self.explored_bits)])
+
+    def _forget(self, row: int) -> None:
+        self.explored_bits[row] = 0
+
+    def _explore(self, row: int, x0: int, y0: int, visible: NDArray[np.bool_]) -> None:
+        x1, y1 = x0 + visible.shape[0], y0 + visible.shape[1]
+        explored = np.unpackbits(self.explored_bits[row, x0:x1], axis=1, count=self.game_map.height)
+        explored[:, y0:y1] |= visible
+        self.explored_bits[row, x0:x1] = np.packbits(explored, axis=1)
+
+    def explored(self, actor: Actor, area: Area | None = None) -> NDArray[np.bool_]:
+        x0, y0, x1, y1 = area or self.game_map.area
+        row = self.views[actor].row
+        return np.unpackbits(self.explored_bits[row, x0:x1], axis=1, count=self.game_map.height)[:, y0:y1].astype(bool)
+
+
+class ChunkedFOVSystem(BaseFOVSystem):
+    """BaseFOVSystem of a ChunkedGameMap. Explored tiles are stored chunk by chunk."""
+
+    game_map: ChunkedGameMap
+
+    def __init__(self, game_map: ChunkedGameMap, capacity: int = 64):
+        super().__init__(game_map, capacity)
+        self.explored_chunks = ChunkedExplored(game_map.directory, capacity)
+
+    @property
+    def capacity(self) -> int:
+        return self.explored_chunks.capacity
+
+    def _grow(self, capacity: int) -> None:
+        self.explored_chunks.grow(capacity)
+
+    def _forget(self, row: int) -> None:
+        self.explored_chunks.clear(row)
+
+    def _explore(self, row: int, x0: int, y0: int, visible: NDArray[np.bool_]) -> None:
+        self.explored_chunks.mark(row, x0, y0, visible)
+
+    def explored(self, actor: Actor, area: Area | None = None) -> NDArray[np.bool_]:
+        x0, y0, x1, y1 = area or self.game_map.area
+        return self.explored_chunks.window(self.views[actor].row, x0, y0, x1, y1)
@@ -1,32 +1,99 @@
 from __future__ import annotations
 
-from collections.abc import Iterable, Iterator
+from collections.abc import Callable, Iterable, Iterator
 from typing import TYPE_CHECKING, Any
 
 from numpy.typing import NDArray
 from tcod.console import Console
 import numpy as np
 
-from entity import Actor, Building, Item
-from events import SpawnEvent, spawn_signal
+from chunks import CHUNK_SIZE, ChunkedTiles, ChunkKey, chunks_around
+from components.needs import NeedsSystem
+from entity import Actor, Building, Corpse, Item
+from events import EventBus, SpawnEvent
+from fov import BaseFOVSystem, ChunkedFOVSystem, FOVSystem
+from game_time import Phase, TurnQueue, current_tick, scheduler
+from lifecycle import Lifecycle
+from pathfinding import AreaDistanceFields, DijkstraMaps, DistanceFields, PathFinder
+from regions import RegionActivity
+from registry import EntityRegistry
+from spatial_index import BaseSpatialIndex, SparseSpatialIndex, SpatialIndex
+import constants
 import tile_types
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
+    from events import TickEvent
+
+# Rectangle of a map from (x0, y0) to (x1, y1), exclusive.
+Area = tuple[int, int, int, int]
 
 
 class GameMap:
+    # Parts which depend on the size of the map, replaced by ChunkedGameMap.
+    index_cls: type[BaseSpatialIndex] = SpatialIndex
+    fov_cls: type[BaseFOVSystem] = FOVSystem
+    distance_fields_cls: type[PathFinder] = DistanceFields
+
     def __init__(self, engine: Engine, width: int, height: int, entities: Iterable[Entity] = ()):
         self.engine = engine
         self.width, self.height = width, height
-        self.entities = set(entities)
-        self.tiles = np.full((width, height), fill_value=tile_types.wall, order="F")
+        self.entities: set[Entity] = set()
+        self.registry = EntityRegistry()  # Ids of the entities on the map and in inventories on it.
+        self.index = self.index_cls(width, height)
+        self.tiles = self._create_tiles()
+        self.dijkstra_maps = DijkstraMaps(self)
+        self.distance_fields = self.distance_fields_cls(self)
+
+        # Per-tick work. Entities without any (e.g. items) are not registered at all.
+        self.turns = TurnQueue()
+        self.fov = self.fov_cls(self)
+        self.needs_system = NeedsSystem()
+        self.tickable_buildings: dict[Building, None] = {}  # Used as ordered sets.
+        self.tickable_actors: dict[Actor, None] = {}
+        self.regions = RegionActivity(self)
+        self.event_bus = EventBus()
+        self.lifecycle = Lifecycle(self, decay_after=constants.corpse_decay_ticks)
+
+        scheduler.add(Phase.REGIONS, self.regions.update)
+        scheduler.add(Phase.AI, self.take_turns)
+        scheduler.add(Phase.FOV, self.fov.update)
+        scheduler.add(Phase.NEEDS, self.needs_system.update)
+        scheduler.add(Phase.BUILDINGS, self.update_buildings)
+        scheduler.add(Phase.FIGHTERS, self.update_fighters)
+        scheduler.add(Phase.LIFECYCLE, self.lifecycle.update)
+        scheduler.add(Phase.EVENTS, self.event_bus.deliver)
+
+        for entity in entities:
+            self.add_entity(entity)
+
+    def _create_tiles(self) -> Any:
+        return np.full((self.width, self.height), fill_value=tile_types.wall, order="F")
 
     @property
     def game_map(self) -> GameMap:
         return self
 
+    @property
+    def area(self) -> Area:
+        """The whole map."""
+        return 0, 0, self.width, self.height
+
+    def window(self, area: Area) -> NDArray[Any]:
+        """Return the tiles of an area. They must not be modified."""
+        x0, y0, x1, y1 = area
+        return self.tiles[x0:x1, y0:y1]
+
+    def local_area(self, x: int, y: int) -> Area:
+        """Return the area in which AIs at (x, y) look for their goals."""
+        return self.area
+
+    @property
+    def camera(self) -> tuple[int, int]:
+        """Location on the map of the top left corner of the screen."""
+        return 0, 0
+
     @property
     def visible(self) -> NDArray[Any]:
         return self.engine.player.visible
@@ -48,28 +115,88 @@ class GameMap:
     def buildings(self) -> Iterator[Building]:
         yield from (entity for entity in self.entities if isinstance(entity, Building))
 
+    def add_entity(self, entity: Entity) -> None:
+        """Put an entity on this map at its current position."""
+        entity.parent = self
+        self.registry.register(entity)
+        self.entities.add(entity)
+        self.index.add(entity)
+        if entity.blocks_movement:
+            self.distance_fields.update_cost(entity.x, entity.y)
+        if isinstance(entity, Actor):
+            if entity is not self.engine.player:  # The player acts through the input handlers.
+                self.turns.add(entity)
+            self.fov.add(entity)
+            entity.needs.attach(self.needs_system)
+            self.tickable_actors[entity] = None
+        elif isinstance(entity, Building):
+            self.tickable_buildings[entity] = None
+        elif isinstance(entity, Corpse):
+            self.lifecycle.add(entity)
+
+    def remove_entity(self, entity: Entity) -> None:
+        self.entities.remove(entity)
+        self.index.remove(entity)
+        if entity.blocks_movement:
+            self.distance_fields.update_cost(entity.x, entity.y)
+        if isinstance(entity, Actor):
+            self.turns.remove(entity)
+            self.fov.remove(entity)
+            self.event_bus.unwatch(entity)
+            entity.needs.detach()
+            self.tickable_actors.pop(entity, None)
+        elif isinstance(entity, Building):
+            self.tickable_buildings.pop(entity, None)
+        self.regions.remove(entity)
+
+    def take_turns(self, event: TickEvent) -> None:
+        self.turns.run(Actor.take_turn)
+
+    def update_buildings(self, event: TickEvent) -> None:
+        for building in self.tickable_buildings:
+            building.interactable.update()
+
+    def update_fighters(self, event: TickEvent) -> None:
+        for actor in self.tickable_actors:
+            if actor.is_alive:
+                actor.fighter.update()
+
+    def move_entity(self, entity: Entity, x: int, y: int) -> None:
+        """Move an entity which is already on this map to a new position."""
+        old_x, old_y = entity.x, entity.y
+        entity.x, entity.y = x, y
+        self.index.move(entity, old_x, old_y)
+        if entity.blocks_movement:
+            self.distance_fields.update_cost(old_x, old_y)
+            self.distance_fields.update_cost(x, y)
+
+    def set_blocks_movement(self, entity: Entity, blocks_movement: bool) -> None:
+        self.index.set_blocking(entity, blocks_movement)
+        entity.blocks_movement = blocks_movement
+        self.distance_fields.update_cost(entity.x, entity.y)
+
     def get_blocking_entity_at_location(
         self,
         location_x: int,
         location_y: int,
     ) -> Entity | None:
-        for entity in self.entities:
-            if entity.blocks_movement and entity.x == location_x and entity.y == location_y:
+        for entity in self.index.at(location_x, location_y):
+            if entity.blocks_movement:
                 return entity
 
         return None
 
     def get_actor_at_location(self, x: int, y: int) -> Actor | None:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for entity in self.index.at(x, y):
+            if isinstance(entity, Actor) and entity.is_alive:
+                return entity
 
         return None
 
     def get_building_at_location(self, x: int, y: int) -> Building | None:
-        for building in self.buildings:
-            if building.x == x and building.y == y:
-                return building
+        for entity in self.index.at(x, y):
+            if isinstance(entity, Building):
+                return entity
 
         return None
 
@@ -85,36 +212,37 @@ class GameMap:
         If it isn't, but it's in the "explored" array, then draw it with the "dark" colors.
         Otherwise, the default is "SHROUD".
         """
-        console.rgb[0 : self.width, 0 : self.height] = np.select(
-            condlist=[self.visible, self.explored],
-            choicelist=[self.tiles["light"], self.tiles["dark"]],
+        player = self.engine.player
+        x0, y0 = self.camera
+        area = x0, y0, min(self.width, x0 + constants.map_width), min(self.height, y0 + constants.map_height)
+        tiles = self.window(area)
+        console.rgb[0 : area[2] - x0, 0 : area[3] - y0] = np.select(
+            condlist=[self.fov.visible(player, area), self.fov.explored(player, area)],
+            choicelist=[tiles["light"], tiles["dark"]],
             default=tile_types.SHROUD,
         )
 
-        entities_sorted_for_rendering = sorted(self.entities, key=lambda x: x.render_order.value)
+        entities_sorted_for_rendering = sorted(
+            (entity for entity in self.entities if self.fov.is_visible(player, entity.x, entity.y)),
+            key=lambda x: x.render_order.value,
+        )
 
         for entity in entities_sorted_for_rendering:
-            if self.visible[entity.x, entity.y]:
-                console.print(x=entity.x, y=entity.y, string=entity.char, fg=entity.color)
+            console.print(x=entity.x - x0, y=entity.y - y0, string=entity.char, fg=entity.color)
 
     def can_spawn_at(self, x: int, y: int) -> bool:
         """Return True if an entity can spawn at this location."""
         return self.in_bounds(x, y) and not self.get_blocking_entity_at_location(x, y)
 
     def spawn(self, entity: Entity) -> None:
-        entity.parent = self
-        self.entities.add(entity)
-
-        spawn_signal.send(
-            self,
-            event=SpawnEvent(entity.x, entity.y, entity),
-        )
+        self.add_entity(entity)
+        self.event_bus.publish(SpawnEvent(entity.x, entity.y, entity.id))
 
     def get_entities_at_location(self, x: int, y: int) -> list[Entity]:
-        return [entity for entity in self.entities if entity.x == x and entity.y == y]
+        return list(self.index.at(x, y))
 
     def get_names_at_location(self, x: int, y: int) -> str:
-        if not self.in_bounds(x, y) or not self.visible[x, y]:
+        if not self.in_bounds(x, y) or not self.fov.is_visible(self.engine.player, x, y):
             return ""
 
         entities = self.get_entities_at_location(x, y)
@@ -126,3 +254,81 @@ class GameMap:
         neighbors = [(x + dx, y + dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if dx != 0 or dy != 0]
         valid_neighbors = [(nx, ny) for nx, ny in neighbors if 0 <= nx < self.width and 0 <= ny < self.height]
         return valid_neighbors
+
+
+class ChunkedGameMap(GameMap):
+    """A GameMap of any size. Its terrain is generated chunk by chunk by `generate` when it is first needed.
+
+    Memory is proportional to the area around actors rather than to the size of the map: every
+    `unload_every` ticks, chunks further than `active_radius` chunks from every living actor are written
+    to `directory` together with the tiles actors explored in them. AIs look for goals within the same
+    distance.
+    """
+
+    index_cls = SparseSpatialIndex
+    fov_cls = ChunkedFOVSystem
+    distance_fields_cls = AreaDistanceFields
+    unload_every = 16
+
+    fov: ChunkedFOVSystem
+    tiles: ChunkedTiles
+
+    def __init__(
+        self,
+        engine: Engine,
+        width: int,
+        height: int,
+        directory: str,
+        generate: Callable[[ChunkedGameMap, int, int, NDArray[Any]], None],
+        entities: Iterable[Entity] = (),
+        active_radius: int = 2,
+    ):
+        self.directory = directory
+        self.generate = generate
+        self.active_radius = active_radius
+        self.pending_spawns: list[tuple[Callable[[GameMap, int, int], Any], int, int]] = []
+        super().__init__(engine, width, height, entities)
+        scheduler.add(Phase.FOV, self.update_chunks)
+
+    def _create_tiles(self) -> Any:
+        return ChunkedTiles(self.directory, self._generate_chunk)
+
+    def _generate_chunk(self, x: int, y: int, tiles: NDArray[Any]) -> None:
+        self.generate(self, x, y, tiles)
+
+    def local_area(self, x: int, y: int) -> Area:
+        radius = self.active_radius * CHUNK_SIZE
+        return max(0, x - radius), max(0, y - radius), min(self.width, x + radius + 1), min(self.height, y + radius + 1)
+
+    @property
+    def camera(self) -> tuple[int, int]:
+        """The screen follows the player."""
+        player = self.engine.player
+        x = min(max(0, player.x - constants.map_width // 2), max(0, self.width - constants.map_width))
+        y = min(max(0, player.y - constants.map_height // 2), max(0, self.height - constants.map_height))
+        return x, y
+
+    def active_chunks(self) -> set[ChunkKey]:
+        active: set[ChunkKey] = set()
+        for actor in self.actors:
+            active.update(chunks_around(actor.x, actor.y, self.active_radius))
+        return active
+
+    def spawn_later(self, spawn: Callable[[GameMap, int, int], Any], x: int, y: int) -> None:
+        """Spawn an entity at the end of the FOV phase.
+
+        Chunks are generated whenever their tiles are needed, which may be while entities are iterated over.
+        """
+        self.pending_spawns.append((spawn, x, y))
+
+    def spawn_pending(self) -> None:
+        pending, self.pending_spawns = self.pending_spawns, []
+        for spawn, x, y in pending:
+            spawn(self, x, y)
+
+    def update_chunks(self, event: TickEvent) -> None:
+        self.spawn_pending()
+        if current_tick() % self.unload_every == 0:
+            active = self.active_chunks()
+            self.tiles.unload(active)
+            self.fov.explored_chunks.unload(active)
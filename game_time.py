@@ -1,19 +1,147 @@
+from __future__ import annotations
+
+from collections.abc import Callable
 from datetime import datetime, timedelta
+from enum import Enum, auto
+from typing import TYPE_CHECKING
+import heapq
+import itertools
+import time
+import weakref
 
 from blinker import Signal
 
 from events import TickEvent
 
+if TYPE_CHECKING:
+    from entity import Actor
+
 _ticks = 0
 tick_signal = Signal("tick")
 
+# Energy spent on one turn. Actors with this speed act once per tick.
+ACTION_COST = 100
+
+
+class Phase(Enum):
+    """Parts of a tick. They are run in the order of definition."""
+
+    LLM = auto()  # Results of background LLM requests are delivered.
+    REGIONS = auto()  # Entities far from intelligent actors are put to sleep or woken up.
+    AI = auto()
+    FOV = auto()
+    NEEDS = auto()
+    BUILDINGS = auto()
+    FIGHTERS = auto()
+    LIFECYCLE = auto()  # Actors which died are replaced by corpses, and old corpses decay.
+    EVENTS = auto()  # Events of the tick are delivered to the actors which saw them.
+    SAVE = auto()  # Autosave, after everything else changed the world.
+
+
+class Scheduler:
+    """Runs the systems registered for each phase of a tick in a fixed order.
+
+    Systems are bound methods held by weak reference (as blinker did with receivers), so systems of a
+    discarded GameMap stop ticking once it is collected.
+    """
+
+    def __init__(self) -> None:
+        self.systems: dict[Phase, list[weakref.WeakMethod]] = {phase: [] for phase in Phase}
+        self.seconds: dict[Phase, float] = dict.fromkeys(Phase, 0.0)  # Time spent in every phase.
+
+    def add(self, phase: Phase, system: Callable[[TickEvent], None]) -> None:
+        self.systems[phase].append(weakref.WeakMethod(system))  # type: ignore[arg-type]
+
+    def run(self, event: TickEvent) -> None:
+        for phase, systems in self.systems.items():
+            start = time.perf_counter()
+            for ref in list(systems):
+                system = ref()
+                if system is None:
+                    systems.remove(ref)
+                else:
+                    system(event)
+            self.seconds[phase] += time.perf_counter() - start
+
+
+class TurnQueue:
+    """Energy based turn order.
+
+    An actor gains `speed` energy per tick and takes a turn for every ACTION_COST energy it has. Actors
+    are kept in a heap by the tick of their next turn, so slow actors are not visited on ticks they
+    can't act. Actors that were added earlier act first within a tick.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[int, int, Actor]] = []
+        self._entries: dict[Actor, int] = {}  # Sequence number of the live heap entry of every actor.
+        self._sequence = itertools.count()
+
+    def __contains__(self, actor: Actor) -> bool:
+        return actor in self._entries
+
+    def add(self, actor: Actor, tick: int | None = None) -> None:
+        """Let the actor act on `tick`, by default on the next one."""
+        actor.energy = ACTION_COST
+        self._push(actor, current_tick() + 1 if tick is None else tick)
+
+    def remove(self, actor: Actor) -> None:
+        self._entries.pop(actor, None)  # Its heap entry is skipped when popped.
+
+    def scheduled(self) -> dict[Actor, int]:
+        """Return the tick of the next turn of every actor, in the order they will act."""
+        entries = sorted(entry for entry in self._heap if self._entries.get(entry[2]) == entry[1])
+        return {actor: tick for tick, _, actor in entries}
+
+    def run(self, take_turn: Callable[[Actor], None]) -> None:
+        now = current_tick()
+        while self._heap and self._heap[0][0] <= now:
+            _, sequence, actor = heapq.heappop(self._heap)
+            if self._entries.get(actor) != sequence:
+                continue
+            if not actor.is_alive:
+                del self._entries[actor]  # Dead actors have nothing to do.
+                continue
+
+            take_turn(actor)
+
+            actor.energy -= ACTION_COST
+            wait = max(0, -((actor.energy - ACTION_COST) // actor.speed))  # Ticks to regain a turn, rounded up.
+            actor.energy += wait * actor.speed
+            self._push(actor, now + wait)
+
+    def _push(self, actor: Actor, tick: int) -> None:
+        sequence = next(self._sequence)
+        self._entries[actor] = sequence
+        heapq.heappush(self._heap, (tick, sequence, actor))
+
+
+scheduler = Scheduler()
+
 
 def tick():
     global _ticks
     _ticks += 1
     print("sending tick", _ticks)
-    tick_signal.send(event=TickEvent(current_datetime()))
+    event = TickEvent(current_datetime(), _ticks)
+    scheduler.run(event)
+    tick_signal.send(event=event)
+
+
+def current_tick() -> int:
+    return _ticks
+
+
+def set_current_tick(tick: int) -> None:
+    """Continue the game time from `tick`, e.g. after loading a save."""
+    global _ticks
+    _ticks = tick
 
 
 def current_datetime() -> datetime:
-    return datetime(1, 1, 1) + timedelta(minutes=_ticks)
+    return tick_datetime(_ticks)
+
+
+def tick_datetime(tick: int) -> datetime:
+    """Game time of a tick. A tick lasts a minute."""
+    return datetime(1, 1, 1) + timedelta(minutes=tick)
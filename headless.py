@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Run the simulation without a window and report how fast it goes.
+
+Example: `python headless.py --ticks 1000 --seed 42 --json`
+
+With `--replay actions.jsonl` the player takes the actions of a recorded game instead of its AI's.
+With `--world-size 10000` the island is 10000x10000 tiles, generated chunk by chunk as it is explored.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass, field
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from engine import Engine
+from events import EventBatch
+from exceptions import Impossible
+from replay import Replay
+import constants
+import game_time
+import savefile
+import setup_game
+
+
+@dataclass
+class BenchmarkReport:
+    ticks: int = 0
+    seconds: float = 0.0
+    phase_seconds: dict[str, float] = field(default_factory=dict)
+    peak_rss_kb: int = 0
+    peak_traced_kb: int | None = None
+    player_alive: bool = True
+    save_seconds: float | None = None
+    load_seconds: float | None = None
+    save_kb: int | None = None
+    events: dict[str, int] = field(default_factory=dict)  # Number of map events of every type.
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        lines = [
+            f"Ticks: {self.ticks} in {self.seconds:.3f}s ({self.ticks_per_second:.1f} ticks/s)",
+            f"Peak RSS: {self.peak_rss_kb / 1024:.1f} MiB",
+        ]
+        if self.peak_traced_kb is not None:
+            lines.append(f"Peak traced Python memory: {self.peak_traced_kb / 1024:.1f} MiB")
+        if self.save_kb is not None:
+            lines.append(f"Save: {self.save_kb} KiB in {self.save_seconds:.3f}s, load in {self.load_seconds:.3f}s")
+        if not self.player_alive:
+            lines.append("The player died, the run was stopped early.")
+        if self.events:
+            lines.append("Events: " + ", ".join(f"{name} {count}" for name, count in self.events.items()))
+        lines.append("Phases:")
+        for phase, seconds in self.phase_seconds.items():
+            lines.append(f"  {phase:<16} {seconds:8.3f}s")
+        return "\n".join(lines)
+
+
+class PhaseTimer:
+    """Accumulates wall time spent in named phases."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+
+    @contextmanager
+    def __call__(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + time.perf_counter() - start
+
+
+def player_turn(engine: Engine) -> bool:
+    """Let the player's AI act instead of the keyboard. Like every AI turn, it ends the turn."""
+    try:
+        engine.player.ai.perform()
+    except Impossible:
+        pass  # Same as for other actors: an impossible action just wastes the turn.
+    return True
+
+
+def benchmark_save(engine: Engine, report: BenchmarkReport) -> None:
+    """Time saving the world to a file and loading it back."""
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "benchmark.sav")
+        start = time.perf_counter()
+        savefile.save(engine, filename)
+        report.save_seconds = time.perf_counter() - start
+        report.save_kb = os.path.getsize(filename) // 1024
+
+        start = time.perf_counter()
+        savefile.load(filename)
+        report.load_seconds = time.perf_counter() - start
+
+
+def run(
+    ticks: int,
+    seed: int | None = None,
+    trace_memory: bool = False,
+    save: bool = False,
+    replay: Replay | None = None,
+    world_size: int | None = None,
+) -> BenchmarkReport:
+    if replay:
+        seed = replay.seed
+    if save and world_size:
+        raise ValueError("Chunked maps can't be saved yet.")
+    if trace_memory:
+        tracemalloc.start()
+
+    timer = PhaseTimer()
+    report = BenchmarkReport()
+    game_time.scheduler.seconds = dict.fromkeys(game_time.Phase, 0.0)
+
+    with timer("generate"):
+        if world_size:
+            chunk_directory = tempfile.mkdtemp(prefix="chunks-")
+            engine = setup_game.new_game(seed, world_size=world_size, chunk_directory=chunk_directory)
+        else:
+            engine = setup_game.new_game(seed)
+
+    def count_events(batch: EventBatch) -> None:
+        for name, count in batch.counts().items():
+            report.events[name] = report.events.get(name, 0) + count
+
+    engine.game_map.event_bus.consumers.append(count_events)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if not engine.player.is_alive:
+            report.player_alive = False
+            break
+        if replay and replay.finished:
+            break
+        with timer("player"):
+            turn_ended = replay.play_turn(engine) if replay else player_turn(engine)
+        if not turn_ended:
+            break  # The action log ended with instant actions, the recorded run stopped before this tick.
+        with timer("world"):
+            game_time.tick()
+        report.ticks += 1
+    report.seconds = time.perf_counter() - start
+
+    report.phase_seconds = timer.seconds
+    # Break the world time down by the phases of the tick scheduler.
+    for phase, seconds in game_time.scheduler.seconds.items():
+        report.phase_seconds[f"world.{phase.name.lower()}"] = seconds
+    report.peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if trace_memory:
+        report.peak_traced_kb = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    if save:
+        benchmark_save(engine, report)
+    if world_size:
+        shutil.rmtree(chunk_directory, ignore_errors=True)
+
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=500, help="number of ticks to simulate")
+    parser.add_argument("--seed", type=int, default=constants.world_seed, help="seed of the world")
+    parser.add_argument("--replay", metavar="FILE", help="take the actions of the player from an action log")
+    parser.add_argument("--world-size", type=int, metavar="N", help="simulate a chunked NxN island")
+    parser.add_argument("--trace-memory", action="store_true", help="also measure peak Python heap (slow)")
+    parser.add_argument("--save", action="store_true", help="also time saving and loading the world")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="don't silence the game's own output")
+    args = parser.parse_args()
+    if args.save and args.world_size:
+        parser.error("--save can't be used with --world-size, chunked maps can't be saved yet")
+    replay = Replay(args.replay) if args.replay else None
+
+    if args.verbose:
+        report = run(args.ticks, args.seed, args.trace_memory, args.save, replay, args.world_size)
+    else:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            report = run(args.ticks, args.seed, args.trace_memory, args.save, replay, args.world_size)
+
+    if args.json:
+        json.dump({**asdict(report), "ticks_per_second": report.ticks_per_second}, sys.stdout, indent=2)
+        print()
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
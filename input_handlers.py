@@ -141,6 +141,8 @@ class EventHandler(BaseEventHandler):
             return False
         assert action is not None  # for mypy
 
+        if self.engine.action_log:
+            self.engine.action_log.record(action)
         try:
             action.perform()
         except exceptions.Impossible as exc:
@@ -151,9 +153,19 @@ class EventHandler(BaseEventHandler):
             tick()
         return True
 
+    def map_location(self, tile: tcod.event.Point) -> tuple[int, int]:
+        """Return the location on the map of a tile of the console. They differ when the map scrolls."""
+        camera_x, camera_y = self.engine.game_map.camera
+        return tile.x + camera_x, tile.y + camera_y
+
+    def screen_location(self, x: int, y: int) -> tuple[int, int]:
+        camera_x, camera_y = self.engine.game_map.camera
+        return x - camera_x, y - camera_y
+
     def ev_mousemotion(self, event: tcod.event.MouseMotion) -> None:
-        if self.engine.game_map.in_bounds(event.tile.x, event.tile.y):
-            self.engine.mouse_location = event.tile.x, event.tile.y
+        x, y = self.map_location(event.tile)
+        if self.engine.game_map.in_bounds(x, y):
+            self.engine.mouse_location = x, y
 
     def on_render(self, console: tcod.Console) -> None:
         self.engine.render(console)
@@ -288,7 +300,7 @@ class SelectIndexHandler(AskUserEventHandler):
     def on_render(self, console: tcod.Console) -> None:
         """Highlight the tile under the cursor."""
         super().on_render(console)
-        x, y = self.engine.mouse_location
+        x, y = self.screen_location(*self.engine.mouse_location)
         console.tiles_rgb["bg"][x, y] = color.white
         console.tiles_rgb["fg"][x, y] = color.black
 
@@ -319,9 +331,10 @@ class SelectIndexHandler(AskUserEventHandler):
 
     def ev_mousebuttondown(self, event: tcod.event.MouseButtonDown) -> ActionOrHandler | None:
         """Left click confirms a selection."""
-        if self.engine.game_map.in_bounds(*event.tile):
+        x, y = self.map_location(event.tile)
+        if self.engine.game_map.in_bounds(x, y):
             if event.button == 1:
-                return self.on_index_selected(*event.tile)
+                return self.on_index_selected(x, y)
         return super().ev_mousebuttondown(event)
 
     def on_index_selected(self, x: int, y: int) -> ActionOrHandler | None:
@@ -367,7 +380,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
         """Highlight the tile under the cursor."""
         super().on_render(console)
 
-        x, y = self.engine.mouse_location
+        x, y = self.screen_location(*self.engine.mouse_location)
 
         # Draw a rectangle around the targeted area, so the player can see the affected tiles.
         console.draw_frame(
@@ -409,7 +422,7 @@ class MainGameEventHandler(EventHandler):
         elif key == tcod.event.K_d:
             return InventoryDropHandler(self.engine)
         elif key == tcod.event.K_q:
-            return InputQueryHandler(self.engine, lambda query: QueryAction(player, query).perform())
+            return InputQueryHandler(self.engine, lambda query: self.handle_action(QueryAction(player, query)))
         elif key == tcod.event.K_SLASH:
             return LookHandler(self.engine)
         elif key == tcod.event.K_l:
@@ -432,8 +445,8 @@ class MainGameEventHandler(EventHandler):
 
     def ev_mousebuttondown(self, event: tcod.event.MouseButtonDown) -> ActionOrHandler | None:
         """Handle left clicks."""
-        x, y = event.tile
-        if event.button == 1 and self.engine.game_map.in_bounds(x, y) and self.engine.game_map.visible[x, y]:
+        x, y = self.map_location(event.tile)
+        if event.button == 1 and self.engine.game_map.in_bounds(x, y) and self.engine.player.can_see(x, y):
             for actor in self.engine.game_map.actors:
                 if actor.x == x and actor.y == y:
                     return ObservationsLogViewer(self.engine, actor)
@@ -528,7 +541,7 @@ class ObservationsLogViewer(TextViewer):
     def __init__(self, engine: Engine, actor: Actor):
         super().__init__(engine)
         self.actor = actor
-        self.log_length = len(actor.observation_log.observations)
+        self.log_length = len(actor.observation_log)
         self.cursor = self.log_length - 1
 
     def on_render(self, console: tcod.Console) -> None:
@@ -553,6 +566,6 @@ class ObservationsLogViewer(TextViewer):
             1,
             log_console.width - 2,
             log_console.height - 2,
-            self.actor.observation_log.observations[: self.cursor + 1],
+            self.actor.observation_log.newest(skip=self.log_length - 1 - self.cursor),
         )
         log_console.blit(console, 3, 3)
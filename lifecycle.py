@@ -0,0 +1,74 @@
+"""What happens to actors after they die."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import heapq
+
+from entity import Corpse
+from game_time import current_tick
+
+if TYPE_CHECKING:
+    from entity import Actor
+    from events import TickEvent
+    from game_map import GameMap
+
+
+class Lifecycle:
+    """Replaces dead actors by corpses and lets corpses decay.
+
+    A dead actor is replaced once per tick, so it never disappears in the middle of a loop over actors.
+    Its corpse takes over its id, so ids of the actor in events and relationships find the corpse. The
+    actor leaves every per-map system, so its turns, FOV, needs and event subscriptions are freed, and
+    the items it carried are dropped where it died. Corpses are removed `decay_after` ticks after the
+    death, unless it is None.
+
+    The player stays an actor, since the game over screen still shows what it sees.
+    """
+
+    def __init__(self, game_map: GameMap, decay_after: int | None = None):
+        self.game_map = game_map
+        self.decay_after = decay_after
+        self.dead: list[Actor] = []  # Died since the last update.
+        self._decay: list[tuple[int, int, Corpse]] = []  # Heap of corpses by their tick of death.
+
+    def died(self, actor: Actor) -> None:
+        if actor is not self.game_map.engine.player:
+            self.dead.append(actor)
+
+    def add(self, corpse: Corpse) -> None:
+        if self.decay_after is not None:
+            heapq.heappush(self._decay, (corpse.died_at, corpse.id, corpse))
+
+    def update(self, event: TickEvent) -> None:
+        dead, self.dead = self.dead, []
+        for actor in dead:
+            if actor.parent is self.game_map:
+                self.bury(actor, event.tick)
+
+        if self.decay_after is None:
+            return
+        game_map = self.game_map
+        while self._decay and self._decay[0][0] + self.decay_after <= event.tick:
+            _, _, corpse = heapq.heappop(self._decay)
+            if corpse in game_map.entities:
+                game_map.remove_entity(corpse)
+                game_map.registry.release(corpse)
+
+    def bury(self, actor: Actor, tick: int | None = None) -> Corpse:
+        """Replace a dead actor by its corpse."""
+        game_map = self.game_map
+        corpse = Corpse(
+            x=actor.x,
+            y=actor.y,
+            identity=actor.identity,
+            kind=actor.kind,
+            died_at=current_tick() if tick is None else tick,
+        )
+        for item in list(actor.inventory.items):
+            actor.inventory.items.remove(item)
+            item.place(actor.x, actor.y, game_map)
+
+        game_map.registry.replace(actor, corpse)
+        game_map.remove_entity(actor)
+        game_map.add_entity(corpse)
+        return corpse
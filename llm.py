@@ -1,17 +1,31 @@
 # ruff: noqa: E501
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from concurrent.futures import Future
 from typing import TYPE_CHECKING
+import asyncio
+import json
 import os
+import threading
 
 from dotenv import load_dotenv
 import jinja2
 import openai
 
-from components.observation_log import ObservationLog
-from constants import cost_saving_mode
+from components.observation_log import Observation, ObservationLog
+from constants import cost_saving_mode, llm_cache_path, llm_replay_only
+from game_time import Phase, scheduler
+from llm_cache import CompletionCache
 
 if TYPE_CHECKING:
     from typing import Any
 
+    from events import TickEvent
+
+Messages = list[dict[str, str]]
+
 load_dotenv()
 openai.organization = os.getenv("OPENAI_ORG")
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -51,12 +65,28 @@ def get_identity_prompt(gender: str, name: str) -> str:
     return template.render(templateVars)
 
 
-def get_reflection_prompt(name: str, observationLog: ObservationLog):
+def get_reflection_prompt(name: str, observationLog: ObservationLog, amount: int = 50):
+    """Prompt for reflecting on the `amount` observations most worth remembering."""
     PROMPT_FILE = "reflection.md.jinja"
     template = promptEnv.get_template(PROMPT_FILE)
 
+    observations = observationLog.retrieve(query=None, amount=amount)
+    templateVars: dict[str, Any] = {
+        "name": name,
+        "summaries": list(observationLog.summaries),
+        "observations": sorted(observations, key=lambda observation: observation.id),
+    }
+
+    return template.render(templateVars)
+
+
+def get_summary_prompt(name: str, observations: list[Observation]):
+    PROMPT_FILE = "summary.md.jinja"
+    template = promptEnv.get_template(PROMPT_FILE)
+
     templateVars: dict[str, Any] = {
-        "observations": observationLog.observations,
+        "name": name,
+        "observations": observations,
     }
 
     return template.render(templateVars)
@@ -87,47 +117,189 @@ hardcoded_identities = [
 ]
 
 
-def generate(prompt: str, system_content: str | None = None) -> str:
-    messages: list[dict[str, str]] = []
+class CompletionBackend(ABC):
+    @abstractmethod
+    async def complete(self, model: str, messages: Messages) -> str:
+        """Return the completion of a chat."""
+
+
+class OpenAIBackend(CompletionBackend):
+    async def complete(self, model: str, messages: Messages) -> str:
+        completion: Any = await openai.ChatCompletion.acreate(model=model, messages=messages)
+        return completion.choices[0].message.content
+
+
+class StubBackend(CompletionBackend):
+    """Backend for tests and offline runs. Answers with `respond(messages)` after `delay` seconds."""
+
+    def __init__(self, respond: Callable[[Messages], str] | None = None, delay: float = 0.0):
+        self.respond = respond or (lambda messages: f"Stub completion of: {messages[-1]['content'][:50]}")
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, model: str, messages: Messages) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.respond(messages)
+
+
+class LLMClient:
+    """Runs completions on an asyncio loop in a background thread, so the simulation never waits for them.
+
+    At most `max_concurrency` requests run at once, failed requests are retried with exponential backoff,
+    and identical requests in flight share a single future. Completions found in `cache` are not requested
+    again. Callbacks passed to `submit` are run on the
+    main thread by `poll`, which the scheduler calls at the start of every tick.
+    """
+
+    def __init__(
+        self,
+        backend: CompletionBackend,
+        model: str = "gpt-3.5-turbo",
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        cache: CompletionCache | None = None,
+    ):
+        self.backend = backend
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self._loop: asyncio.AbstractEventLoop | None = None  # Started on first use.
+        self._semaphore: asyncio.Semaphore | None = None
+        self._in_flight: dict[str, Future[str]] = {}
+        self._lock = threading.Lock()
+        self._callbacks: list[tuple[Future[str], Callable[[str], None]]] = []
+
+    def submit(self, messages: Messages, on_done: Callable[[str], None] | None = None) -> Future[str]:
+        """Request a completion in the background."""
+        key = json.dumps([self.model, messages])
+        completion = self.cache.get(CompletionCache.key(self.model, messages)) if self.cache is not None else None
+        if completion is not None:
+            future: Future[str] = Future()
+            future.set_result(completion)
+            if on_done:
+                self._callbacks.append((future, on_done))
+            return future
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = asyncio.run_coroutine_threadsafe(self._complete(key, messages), self._get_loop())
+                self._in_flight[key] = future
+        if on_done:
+            self._callbacks.append((future, on_done))
+        return future
+
+    def poll(self, event: TickEvent | None = None) -> None:
+        """Run the callbacks of finished requests."""
+        # Futures complete on the loop thread, so each is checked once to land in exactly one of the lists.
+        finished: list[tuple[Future[str], Callable[[str], None]]] = []
+        pending: list[tuple[Future[str], Callable[[str], None]]] = []
+        for entry in self._callbacks:
+            (finished if entry[0].done() else pending).append(entry)
+        self._callbacks = pending
+        for future, callback in finished:
+            if future.exception():
+                print(f"LLM request failed: {future.exception()!r}")
+                continue
+            callback(future.result())
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+        return self._loop
+
+    async def _complete(self, key: str, messages: Messages) -> str:
+        assert self._semaphore is not None
+        try:
+            async with self._semaphore:
+                completion = await self._complete_with_retries(messages)
+            if self.cache is not None:
+                self.cache.put(CompletionCache.key(self.model, messages), completion)
+            return completion
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def _complete_with_retries(self, messages: Messages) -> str:
+        """Make up to `max_retries` attempts and raise the error of the last one."""
+        for attempt in range(self.max_retries):
+            try:
+                return await self.backend.complete(self.model, messages)
+            except Exception as exc:  # Errors of the API differ between backends.
+                if attempt == self.max_retries - 1:
+                    raise
+                print(f"LLM request failed ({exc!r}), retrying.")
+                await asyncio.sleep(self.backoff * 2**attempt)
+        raise ValueError("max_retries must be positive")
+
+
+client = LLMClient(OpenAIBackend(), cache=CompletionCache(llm_cache_path, replay_only=llm_replay_only))
+scheduler.add(Phase.LLM, client.poll)
+
+
+def get_messages(prompt: str, system_content: str | None = None) -> Messages:
+    messages: Messages = []
     if system_content:
         messages.append({"role": "system", "content": system_content})
     messages.append({"role": "user", "content": prompt})
 
     print(f"[Prompt]: {prompt}\n")
 
-    completion: Any = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=messages,
-    )
+    return messages
+
 
-    return completion.choices[0].message.content
+def generate(prompt: str, system_content: str | None = None) -> str:
+    """Request a completion and wait for it."""
+    return client.submit(get_messages(prompt, system_content)).result()
 
 
 hardcoded_identity_index = 0
 
 
-def generate_identitiy(gender: str, name: str, dumb: bool = cost_saving_mode) -> str:
+def generate_identitiy(gender: str, name: str, on_done: Callable[[str], None], dumb: bool = cost_saving_mode) -> None:
+    """Generate a description of a character. `on_done` is called with it, possibly on a later tick."""
     if dumb:
         global hardcoded_identity_index
         hardcoded_identity_index += 1
-        return (
+        on_done(
             hardcoded_identities[hardcoded_identity_index % len(hardcoded_identities)]
             .replace("[female]", name)
             .replace("[male]", name)
         )
+        return
 
     prompt = get_identity_prompt(gender, name)
-    return generate(prompt)
+    client.submit(get_messages(prompt), on_done)
 
 
-def generate_reflection(name: str, observationLog: ObservationLog, dumb: bool = cost_saving_mode) -> str:
+def generate_reflection(
+    name: str, observationLog: ObservationLog, on_done: Callable[[str], None], dumb: bool = cost_saving_mode
+) -> Future[str]:
+    """Request a reflection. `on_done` is called with it on a later tick."""
     # if dumb:
     #    return ""
 
     prompt = get_reflection_prompt(name, observationLog)
-    return generate(prompt)
+    return client.submit(get_messages(prompt), on_done)
+
+
+def generate_summary(
+    name: str, observations: list[Observation], on_done: Callable[[str], None], dumb: bool = cost_saving_mode
+) -> None:
+    """Summarizer of observation logs. In cost saving mode the extracted summary is kept."""
+    if dumb:
+        return
+
+    prompt = get_summary_prompt(name, observations)
+    client.submit(get_messages(prompt), on_done)
 
 
 if __name__ == "__main__":
-    identity = generate_identitiy("male", "Mythos O'Conner", False)
+    identity = generate(get_identity_prompt("male", "Mythos O'Conner"))
     print("[Result]: ", identity)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import hashlib
+import json
+import sqlite3
+import threading
+
+from exceptions import ReplayCacheMiss
+
+if TYPE_CHECKING:
+    from llm import Messages
+
+
+class CompletionCache:
+    """Completions stored in an SQLite file, keyed by a hash of the model and the messages.
+
+    At most `max_entries` completions are kept; the least recently used ones are evicted first.
+    In replay-only mode a completion which is not in the cache raises ReplayCacheMiss instead of
+    being requested, so replays of a simulation are deterministic and free.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10_000, replay_only: bool = False):
+        self.path = path
+        self.max_entries = max_entries
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        # Completions are stored from the thread of the LLM client and looked up from the main one.
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None  # Opened on first use, so creating a cache is free.
+        self._clock = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database, created if needed. Must be used with `_lock` held."""
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, completion TEXT, last_used INTEGER)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)")
+            self._clock = connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM completions").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def key(model: str, messages: Messages) -> str:
+        return hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock, self.connection as connection:
+            row = connection.execute("SELECT completion FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.replay_only:
+                    raise ReplayCacheMiss(f"No cached completion for {key}")
+                return None
+            self.hits += 1
+            self._clock += 1
+            connection.execute("UPDATE completions SET last_used = ? WHERE key = ?", (self._clock, key))
+            return row[0]
+
+    def put(self, key: str, completion: str) -> None:
+        with self._lock, self.connection as connection:
+            self._clock += 1
+            connection.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?)", (key, completion, self._clock))
+            connection.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
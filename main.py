@@ -6,13 +6,14 @@ import tcod
 import constants
 import exceptions
 import input_handlers
+import savefile
 import setup_game
 
 
 def save_game(handler: input_handlers.BaseEventHandler, filename: str) -> None:
     """If the current event handler has an active Engine then save it."""
     if isinstance(handler, input_handlers.EventHandler):
-        handler.engine.save_as(filename)
+        savefile.save(handler.engine, filename, constants.save_compressor)
         print("Game saved.")
 
 
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+import hashlib
+
+from numpy.typing import NDArray
+import numpy as np
+import tcod
+
+from chunks import CHUNK_SIZE
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+# Distance of tiles from which no goal can be reached.
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+class DijkstraMaps:
+    """Dijkstra maps shared by every AI on a map.
+
+    See http://www.roguebasin.com/index.php/The_Incredible_Power_of_Dijkstra_Maps
+    A map holds the number of steps from every tile to the closest goal. Maps are computed in C by
+    tcod and cached by their goals and the revision of the terrain, so AIs with the same goals reuse
+    one map until the goals or the terrain change.
+
+    Only the terrain is taken into account. Entities move every tick and would make every map
+    stale right away, so callers have to skip occupied tiles themselves.
+    """
+
+    def __init__(self, game_map: GameMap, max_cached: int = 32):
+        self.game_map = game_map
+        self.max_cached = max_cached
+        self.revision = 0  # Incremented whenever walkability of tiles changes.
+        self._cache: OrderedDict[tuple[int, bytes], NDArray[np.int32]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self) -> None:
+        """Drop all maps. Must be called when walkability of tiles changes."""
+        self.revision += 1
+        self._cache.clear()
+
+    def get(self, goals: NDArray[np.bool_], origin: tuple[int, int] = (0, 0)) -> NDArray[np.int32]:
+        """Return the Dijkstra map for a boolean array of goal tiles. It must not be modified.
+
+        By default `goals` covers the whole map, otherwise the area of its size at `origin`.
+        """
+        area = np.array([*origin, *goals.shape], dtype=np.int64)
+        key = self.revision, hashlib.blake2b(np.packbits(goals).tobytes() + area.tobytes(), digest_size=16).digest()
+        distance = self._cache.get(key)
+        if distance is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return distance
+
+        self.misses += 1
+        distance = np.full(goals.shape, UNREACHABLE, dtype=np.int32)
+        distance[goals] = 0
+        x, y = origin
+        walkable = self.game_map.window((x, y, x + goals.shape[0], y + goals.shape[1]))["walkable"]
+        tcod.path.dijkstra2d(distance, walkable, cardinal=1, diagonal=1, out=distance)
+
+        self._cache[key] = distance
+        if len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return distance
+
+
+class PathFinder(ABC):
+    """Finds the paths of AIs towards targets, around terrain and blocking entities."""
+
+    # Cost of walking through a tile with a blocking entity on it. A lower number means more enemies
+    # will crowd behind each other in hallways. A higher number means enemies will take longer paths in
+    # order to surround the player.
+    blocked_cost = 10
+
+    def __init__(self, game_map: GameMap, max_cached: int = 16):
+        self.game_map = game_map
+        self.max_cached = max_cached
+
+    @abstractmethod
+    def path(self, start: tuple[int, int], target: tuple[int, int], tick: int) -> list[tuple[int, int]]:
+        """Return the path from `start` to `target`, excluding `start`. Empty if there is no path."""
+
+    def update_cost(self, x: int, y: int) -> None:
+        """Called by GameMap after a blocking entity entered or left a tile, for finders which keep costs."""
+
+
+class DistanceFields(PathFinder):
+    """Distance fields towards single targets, shared by every AI chasing the same target.
+
+    The cost grid is kept up to date as blocking entities move (GameMap calls `update_cost`), and a
+    field is computed at most once per tick per target, however many AIs ask for it.
+    """
+
+    def __init__(self, game_map: GameMap, max_cached: int = 16):
+        super().__init__(game_map, max_cached)
+        self._cost: NDArray[np.int8] | None = None  # Built on first use, after the map is generated.
+        self.revision = 0  # Incremented on every cost change.
+        # Target -> (tick, cost revision, field) of the last computation.
+        self._fields: OrderedDict[tuple[int, int], tuple[int, int, NDArray[np.int32]]] = OrderedDict()
+
+    @property
+    def cost(self) -> NDArray[np.int8]:
+        if self._cost is None:
+            walkable = self.game_map.tiles["walkable"]
+            self._cost = np.array(walkable, dtype=np.int8)
+            self._cost[walkable & (self.game_map.index.blocking_window(self.game_map.area) > 0)] += self.blocked_cost
+        return self._cost
+
+    def invalidate(self) -> None:
+        """Rebuild the cost grid on next use. Must be called when walkability of tiles changes."""
+        self._cost = None
+        self._fields.clear()
+
+    def update_cost(self, x: int, y: int) -> None:
+        """Recompute the cost of a tile after a blocking entity entered or left it."""
+        if self._cost is None or not self.game_map.tiles["walkable"][x, y]:
+            return
+        self._cost[x, y] = 1 + self.blocked_cost * self.game_map.index.is_blocked(x, y)
+        self.revision += 1
+
+    def get(self, target_x: int, target_y: int, tick: int) -> NDArray[np.int32]:
+        """Return the distance field of the target. It must not be modified.
+
+        A field computed earlier during the same tick is reused even if the costs changed since.
+        """
+        key = target_x, target_y
+        cached = self._fields.get(key)
+        if cached is not None and (cached[0] == tick or cached[1] == self.revision):
+            self._fields.move_to_end(key)
+            return cached[2]
+
+        distance = np.full((self.game_map.width, self.game_map.height), UNREACHABLE, dtype=np.int32)
+        distance[key] = 0
+        tcod.path.dijkstra2d(distance, self.cost, cardinal=2, diagonal=3, out=distance)
+
+        self._fields[key] = (tick, self.revision, distance)
+        if len(self._fields) > self.max_cached:
+            self._fields.popitem(last=False)
+        return distance
+
+    def path(self, start: tuple[int, int], target: tuple[int, int], tick: int) -> list[tuple[int, int]]:
+        distance = self.get(*target, tick)
+        if distance[start] == UNREACHABLE:
+            return []
+        path: list[list[int]] = tcod.path.hillclimb2d(distance, start, cardinal=True, diagonal=True)[1:].tolist()
+        return [(index[0], index[1]) for index in path]
+
+
+class AreaDistanceFields(PathFinder):
+    """Paths for maps too large for distance fields of the whole map.
+
+    A field only covers the area around the start and the target of a path, and its costs are computed
+    with it instead of being kept up to date. Fields are reused within a tick.
+    """
+
+    # Tiles around the start and the target which are searched for a path.
+    margin = CHUNK_SIZE
+
+    def __init__(self, game_map: GameMap, max_cached: int = 16):
+        super().__init__(game_map, max_cached)
+        # (target x, target y, x0, y0, x1, y1) -> (tick, field) of the last computation.
+        self._fields: OrderedDict[tuple[int, int, int, int, int, int], tuple[int, NDArray[np.int32]]] = OrderedDict()
+
+    def path(self, start: tuple[int, int], target: tuple[int, int], tick: int) -> list[tuple[int, int]]:
+        game_map = self.game_map
+        x0 = max(0, min(start[0], target[0]) - self.margin)
+        y0 = max(0, min(start[1], target[1]) - self.margin)
+        x1 = min(game_map.width, max(start[0], target[0]) + self.margin + 1)
+        y1 = min(game_map.height, max(start[1], target[1]) + self.margin + 1)
+
+        key = target[0], target[1], x0, y0, x1, y1
+        cached = self._fields.get(key)
+        if cached is not None and cached[0] == tick:
+            distance = cached[1]
+        else:
+            walkable = game_map.window((x0, y0, x1, y1))["walkable"]
+            cost = np.array(walkable, dtype=np.int8)
+            cost[walkable & (game_map.index.blocking_window((x0, y0, x1, y1)) > 0)] += self.blocked_cost
+            distance = np.full((x1 - x0, y1 - y0), UNREACHABLE, dtype=np.int32)
+            distance[target[0] - x0, target[1] - y0] = 0
+            tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3, out=distance)
+            self._fields[key] = (tick, distance)
+            if len(self._fields) > self.max_cached:
+                self._fields.popitem(last=False)
+
+        local_start = start[0] - x0, start[1] - y0
+        if distance[local_start] == UNREACHABLE:
+            return []
+        path = tcod.path.hillclimb2d(distance, local_start, cardinal=True, diagonal=True)[1:].tolist()
+        return [(index[0] + x0, index[1] + y0) for index in path]
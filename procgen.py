@@ -2,18 +2,24 @@ from __future__ import annotations
 
 from collections.abc import Iterator
 from typing import TYPE_CHECKING, Any
-import random
 
 from numpy.typing import NDArray
+import numpy as np
 import tcod
 import tcod.noise
 
-from game_map import GameMap
+from game_map import ChunkedGameMap, GameMap
+from rng import world
 import entity_factories
 import tile_types
 
 if TYPE_CHECKING:
     from engine import Engine
+    from game_map import Area
+
+# Terrain of islands. Generation picks an index into it for every tile.
+terrain = np.array([tile_types.water, tile_types.sand, tile_types.mountain, tile_types.forrest, tile_types.grass])
+FOREST = 3
 
 
 class RectangularRoom:
@@ -41,25 +47,25 @@ class RectangularRoom:
 
 
 def place_entities(room: RectangularRoom, dungeon: GameMap, maximum_monsters: int, maximum_items: int) -> None:
-    number_of_monsters = random.randint(0, maximum_monsters)
-    number_of_items = random.randint(0, maximum_items)
+    number_of_monsters = world.randint(0, maximum_monsters)
+    number_of_items = world.randint(0, maximum_items)
 
     for _ in range(number_of_monsters):
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
+        x = world.randint(room.x1 + 1, room.x2 - 1)
+        y = world.randint(room.y1 + 1, room.y2 - 1)
 
         if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            if random.random() < 0.8:
+            if world.random() < 0.8:
                 entity_factories.spawn_orc(dungeon, x, y)
             else:
                 entity_factories.spawn_troll(dungeon, x, y)
 
     for _ in range(number_of_items):
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
+        x = world.randint(room.x1 + 1, room.x2 - 1)
+        y = world.randint(room.y1 + 1, room.y2 - 1)
 
         if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            item_chance = random.random()
+            item_chance = world.random()
 
             if item_chance < 0.7:
                 entity_factories.spawn_health_potion(dungeon, x, y)
@@ -75,7 +81,7 @@ def tunnel_between(start: tuple[int, int], end: tuple[int, int]) -> Iterator[tup
     """Return an L-shaped tunnel between these two points."""
     x1, y1 = start
     x2, y2 = end
-    if random.random() < 0.5:  # 50% chance.
+    if world.random() < 0.5:  # 50% chance.
         # Move horizontally, then vertically.
         corner_x, corner_y = x2, y1
     else:
@@ -104,11 +110,11 @@ def generate_dungeon(
     rooms: list[RectangularRoom] = []
 
     for _ in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
+        room_width = world.randint(room_min_size, room_max_size)
+        room_height = world.randint(room_min_size, room_max_size)
 
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
+        x = world.randint(0, dungeon.width - room_width - 1)
+        y = world.randint(0, dungeon.height - room_height - 1)
 
         # "RectangularRoom" class makes rectangles easier to work with
         new_room = RectangularRoom(x, y, room_width, room_height)
@@ -137,17 +143,21 @@ def generate_dungeon(
     return dungeon
 
 
-def generate_heightmap(width: int, height: int, scale: float, octaves: int, lacunarity: float) -> NDArray[Any]:
-    shape = (width, height)
-
-    noise = tcod.noise.Noise(
+def island_noise(octaves: int = 6, lacunarity: float = 2.0) -> tcod.noise.Noise:
+    return tcod.noise.Noise(
         dimensions=2,
         algorithm=tcod.NOISE_SIMPLEX,
         implementation=0,
         octaves=octaves,
         lacunarity=lacunarity,
-        seed=42,
+        seed=world.getrandbits(32),
     )
+
+
+def generate_heightmap(width: int, height: int, scale: float, octaves: int, lacunarity: float) -> NDArray[Any]:
+    shape = (width, height)
+
+    noise = island_noise(octaves, lacunarity)
     samples = noise[tcod.noise.grid(shape, scale, origin=(0, 0))]
 
     print(samples.shape)
@@ -155,6 +165,31 @@ def generate_heightmap(width: int, height: int, scale: float, octaves: int, lacu
     return (samples + 1) / 2
 
 
+def island_kinds(heights: NDArray[Any], x: int, y: int, map_width: int, map_height: int) -> NDArray[np.intp]:
+    """Return the index into `terrain` of every tile of an area at (x, y) of an island, given their heights."""
+    xs = np.arange(x, x + heights.shape[0])
+    ys = np.arange(y, y + heights.shape[1])
+    x_center = map_width // 2
+    y_center = map_height // 2
+
+    # Land gets lower towards the edges of the map.
+    len_from_center_x = np.abs(x_center - xs) / x_center
+    len_from_center_y = np.abs(y_center - ys) / y_center
+    h = heights * (1 - np.maximum(len_from_center_x[:, None], len_from_center_y[None, :]))
+
+    # Tiles past the edges, which are in chunks on the edges, are water like the edges.
+    border = ((xs <= 0) | (xs >= map_width - 1))[:, None] | ((ys <= 0) | (ys >= map_height - 1))[None, :]
+
+    return np.select([border | (h < 0.15), h < 0.2, h > 0.7, (0.4 < h) & (h < 0.7)], [0, 1, 2, 3], default=4)
+
+
+def write_terrain(tiles: NDArray[Any], kinds: NDArray[np.intp]) -> None:
+    # Indexing arrays of tiles is slow, so the bytes of the tiles are copied instead.
+    width, height = tiles.shape
+    tile_bytes = tiles.T.view(np.uint8).reshape(height, width, terrain.itemsize)
+    tile_bytes[:] = terrain.view(np.uint8).reshape(len(terrain), terrain.itemsize)[kinds.T]
+
+
 def generate_island(
     map_width: int,
     map_height: int,
@@ -173,90 +208,136 @@ def generate_island(
         lacunarity=2.0,
     )
 
-    x_center = map_width // 2
-    y_center = map_height // 2
+    kinds = island_kinds(height_map.T, 0, 0, map_width, map_height)
 
     player = engine.player
     island = GameMap(engine, map_width, map_height, entities=[player])
-    for x in range(map_width):
-        for y in range(map_height):
-            len_from_center_x = abs(x_center - x) / x_center
-            len_from_center_y = abs(y_center - y) / y_center
-
-            h = height_map[y][x] * (1 - max(len_from_center_x, len_from_center_y))
-
-            if x == 0 or y == 0 or x == map_width - 1 or y == map_height - 1:
-                island.tiles[x, y] = tile_types.water
-            elif h < 0.15:
-                island.tiles[x, y] = tile_types.water
-            elif h < 0.2:
-                island.tiles[x, y] = tile_types.sand
-            elif h > 0.7:
-                island.tiles[x, y] = tile_types.mountain
-            elif 0.4 < h < 0.7:
-                island.tiles[x, y] = tile_types.forrest
-            else:
-                island.tiles[x, y] = tile_types.grass
+    write_terrain(island.tiles, kinds)
 
     player.place(map_width // 2, map_height // 2)
 
-    number_of_monsters = random.randint(1, maximum_monsters)
-    number_of_items = random.randint(1, maximum_items)
-    number_of_allies = random.randint(1, maximum_allies)
+    number_of_monsters = world.randint(1, maximum_monsters)
+    number_of_items = world.randint(1, maximum_items)
+    number_of_allies = world.randint(1, maximum_allies)
 
-    while number_of_monsters > 0:
-        x = random.randint(0, map_width - 1)
-        y = random.randint(0, map_height - 1)
+    free_cells = FreeCells(island, np.random.default_rng(world.getrandbits(64)))
 
-        if not any(entity.x == x and entity.y == y for entity in island.entities) and island.tiles[x, y][0]:
-            if random.random() < 0.8:
-                entity_factories.spawn_orc(island, x, y)
-            else:
-                entity_factories.spawn_troll(island, x, y)
-            number_of_monsters -= 1
-
-    while number_of_items > 0:
-        x = random.randint(0, map_width - 1)
-        y = random.randint(0, map_height - 1)
-
-        if not any(entity.x == x and entity.y == y for entity in island.entities) and island.tiles[x, y][0]:
-            if random.random() < 0.7:
-                entity_factories.spawn_health_potion(island, x, y)
-            elif random.random() < 0.8:
-                entity_factories.spawn_fireball_scroll(island, x, y)
-            elif random.random() < 0.9:
-                entity_factories.spawn_confusion_scroll(island, x, y)
-            else:
-                entity_factories.spawn_lightning_scroll(island, x, y)
-            number_of_items -= 1
+    # Trees grow in forests. They go first, so that the events of their spawns don't reach the other actors.
+    for x, y in free_cells.take_where(kinds == FOREST, chance=0.05):
+        entity_factories.spawn_tree(island, x, y)
+
+    populate_island(island, free_cells, number_of_monsters, number_of_items, number_of_allies)
+    return island
 
-    while number_of_allies > 0:
-        x = random.randint(0, map_width - 1)
-        y = random.randint(0, map_height - 1)
 
-        if not any(entity.x == x and entity.y == y for entity in island.entities) and island.tiles[x, y][0]:
-            dist_to_player = ((player.x - x) ** 2 + (player.y - y) ** 2) / (map_width + map_height)
-            # TODO probably sensitive to map scale now
-            if random.random() * 2 > dist_to_player:
-                entity_factories.spawn_human(island, x, y)
-                number_of_allies -= 1
+def populate_island(
+    island: GameMap, free_cells: FreeCells, number_of_monsters: int, number_of_items: int, number_of_allies: int
+) -> None:
+    """Spawn monsters and items anywhere in `free_cells`, and humans around the player."""
+    player = island.engine.player
+    for x, y in free_cells.take(number_of_monsters):
+        if world.random() < 0.8:
+            entity_factories.spawn_orc(island, x, y)
+        else:
+            entity_factories.spawn_troll(island, x, y)
+
+    for x, y in free_cells.take(number_of_items):
+        if world.random() < 0.7:
+            entity_factories.spawn_health_potion(island, x, y)
+        elif world.random() < 0.8:
+            entity_factories.spawn_fireball_scroll(island, x, y)
+        elif world.random() < 0.9:
+            entity_factories.spawn_confusion_scroll(island, x, y)
+        else:
+            entity_factories.spawn_lightning_scroll(island, x, y)
+
+    # Allies are more likely to start close to the player.
+    x0, y0, x1, y1 = free_cells.area
+    dist_to_player = free_cells.squared_distances(player.x, player.y) / (x1 - x0 + y1 - y0)
+    # TODO probably sensitive to map scale now
+    for x, y in free_cells.take(number_of_allies, weights=1 - dist_to_player / 2):
+        entity_factories.spawn_human(island, x, y)
 
     # TODO temporary hack
-    spawned_llm_agent = False
-    while not spawned_llm_agent:
-        x = random.randint(0, map_width - 1)
-        y = random.randint(0, map_height - 1)
-
-        if not any(entity.x == x and entity.y == y for entity in island.entities) and island.tiles[x, y][0]:
-            dist_to_player = ((player.x - x) ** 2 + (player.y - y) ** 2) / (map_width + map_height)
-            if random.random() * 0.5 > dist_to_player:
-                entity_factories.spawn_smart_human(island, x, y)
-                spawned_llm_agent = True
-
-    for x in range(map_width):
-        for y in range(map_height):
-            if island.tiles[x, y] == tile_types.forrest:
-                if random.random() < 0.05:
-                    entity_factories.spawn_tree(island, x, y)
+    for x, y in free_cells.take(1, weights=1 - dist_to_player / 0.5):
+        entity_factories.spawn_smart_human(island, x, y)
+
+
+class ChunkedIsland:
+    """Generates the chunks of a ChunkedGameMap as parts of a single island.
+
+    A chunk does not depend on the chunks generated before it, so the island is the same whichever way
+    actors explore it.
+    """
+
+    def __init__(self, scale: float = 0.09):
+        self.scale = scale
+        self.noise = island_noise()
+        self.seed = world.getrandbits(64)
+
+    def __call__(self, island: ChunkedGameMap, x: int, y: int, tiles: NDArray[Any]) -> None:
+        grid = tcod.noise.grid(tiles.shape, self.scale, indexing="ij", offset=(x, y))
+        kinds = island_kinds((self.noise[grid] + 1) / 2, x, y, island.width, island.height)
+        write_terrain(tiles, kinds)
+
+        rng = np.random.default_rng([self.seed, x, y])
+        for tree_x, tree_y in np.argwhere((kinds == FOREST) & (rng.random(kinds.shape) < 0.05)):
+            island.spawn_later(entity_factories.spawn_tree, x + int(tree_x), y + int(tree_y))
+
+
+def generate_chunked_island(
+    map_width: int,
+    map_height: int,
+    engine: Engine,
+    directory: str,
+    maximum_monsters: int = 10,
+    maximum_items: int = 5,
+    maximum_allies: int = 5,
+) -> ChunkedGameMap:
+    """Generate an island of any size. Only the area around the player is populated."""
+    player = engine.player
+    island = ChunkedGameMap(engine, map_width, map_height, directory, ChunkedIsland(), entities=[player])
+    player.place(map_width // 2, map_height // 2)
+
+    number_of_monsters = world.randint(1, maximum_monsters)
+    number_of_items = world.randint(1, maximum_items)
+    number_of_allies = world.randint(1, maximum_allies)
 
+    area = island.local_area(player.x, player.y)
+    island.window(area)  # Generates the chunks, and with them the trees.
+    island.spawn_pending()
+    free_cells = FreeCells(island, np.random.default_rng(world.getrandbits(64)), area)
+    populate_island(island, free_cells, number_of_monsters, number_of_items, number_of_allies)
     return island
+
+
+class FreeCells:
+    """Walkable cells of an area of a map which are not taken by an entity yet, to place entities on."""
+
+    def __init__(self, game_map: GameMap, rng: np.random.Generator, area: Area | None = None):
+        self.rng = rng
+        self.area = area or game_map.area
+        self.cells = np.argwhere(game_map.window(self.area)["walkable"]) + self.area[:2]
+        self.free = np.ones(len(self.cells), dtype=bool)
+        for entity in game_map.entities:
+            self.free &= (self.cells[:, 0] != entity.x) | (self.cells[:, 1] != entity.y)
+
+    def squared_distances(self, x: int, y: int) -> NDArray[np.int64]:
+        return ((self.cells - (x, y)) ** 2).sum(axis=1)
+
+    def take(self, amount: int, weights: NDArray[Any] | None = None) -> list[tuple[int, int]]:
+        """Take `amount` random cells. A cell is chosen in proportion to its weight, negative weights are 0."""
+        p = self.free.astype(float) if weights is None else np.clip(weights, 0, None) * self.free
+        amount = min(amount, np.count_nonzero(p))
+        if amount == 0:
+            return []
+        chosen = self.rng.choice(len(self.cells), size=amount, replace=False, p=p / p.sum())
+        self.free[chosen] = False
+        return [(int(x), int(y)) for x, y in self.cells[chosen]]
+
+    def take_where(self, mask: NDArray[np.bool_], chance: float) -> list[tuple[int, int]]:
+        """Take every cell in `mask`, an array of the area, with probability `chance`."""
+        x, y = (self.cells - self.area[:2]).T
+        chosen = self.free & mask[x, y] & (self.rng.random(len(self.cells)) < chance)
+        self.free[chosen] = False
+        return [(int(x), int(y)) for x, y in self.cells[chosen]]
@@ -0,0 +1,112 @@
+"""Simulation of the parts of a map which no intelligent actor is around to observe, at a lower rate."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from chunks import ChunkKey, chunk_of, chunks_around
+from entity import Actor, Building, IntelligentActor
+from game_time import current_tick
+
+if TYPE_CHECKING:
+    from entity import Entity
+    from events import TickEvent
+    from game_map import GameMap
+
+
+class RegionActivity:
+    """Puts actors and buildings far from every intelligent actor to sleep.
+
+    The map is split into regions of the size of chunks. Regions within `radius` regions of a living
+    intelligent actor are active and the rest are dormant. Entities in dormant regions leave the per-tick
+    systems: their needs, FOV and buildings are not updated and actors leave the turn queue. Instead,
+    every `dormant_every` ticks dormant actors take a single turn, and everything dormant entities missed
+    since they were last updated is caught up at once. Activity is also recomputed then, so entities are
+    woken at most `dormant_every` ticks after an intelligent actor comes close.
+    """
+
+    def __init__(self, game_map: GameMap, radius: int = 1, dormant_every: int = 10):
+        self.game_map = game_map
+        self.radius = radius
+        self.dormant_every = dormant_every
+        self.active_regions: set[ChunkKey] = set()
+        self.dormant: dict[Entity, int] = {}  # The first tick every dormant entity missed.
+
+    def is_dormant(self, entity: Entity) -> bool:
+        return entity in self.dormant
+
+    def update(self, event: TickEvent) -> None:
+        now = current_tick()
+        if now % self.dormant_every:
+            return
+        game_map = self.game_map
+        self.active_regions = {
+            region
+            for actor in game_map.actors
+            if isinstance(actor, IntelligentActor)
+            for region in chunks_around(actor.x, actor.y, self.radius)
+        }
+
+        waking = [entity for entity in self.dormant if chunk_of(entity.x, entity.y) in self.active_regions]
+        for entity in waking:
+            self.wake(entity)
+
+        self.catch_up()
+        for entity in list(self.dormant):
+            if isinstance(entity, Actor) and entity.is_alive:
+                entity.take_turn()
+
+        for entity in [*game_map.tickable_actors, *game_map.tickable_buildings]:
+            if entity is not game_map.engine.player and chunk_of(entity.x, entity.y) not in self.active_regions:
+                self.sleep(entity, now)
+
+    def sleep(self, entity: Entity, since: int) -> None:
+        """Take the entity out of the per-tick systems. It has missed every tick from `since` on."""
+        game_map = self.game_map
+        self.dormant[entity] = since
+        if isinstance(entity, Actor):
+            game_map.turns.remove(entity)
+            game_map.tickable_actors.pop(entity, None)
+            entity.needs.system.dormant[entity.needs.row] = True
+        elif isinstance(entity, Building):
+            game_map.tickable_buildings.pop(entity, None)
+
+    def wake(self, entity: Entity) -> None:
+        """Catch the entity up and put it back into the per-tick systems."""
+        game_map = self.game_map
+        self.catch_up([entity])
+        del self.dormant[entity]
+        if isinstance(entity, Actor):
+            if entity.is_alive and entity is not game_map.engine.player:
+                game_map.turns.add(entity, current_tick())
+            game_map.tickable_actors[entity] = None
+            entity.needs.system.dormant[entity.needs.row] = False
+        elif isinstance(entity, Building):
+            game_map.tickable_buildings[entity] = None
+
+    def remove(self, entity: Entity) -> None:
+        self.dormant.pop(entity, None)
+
+    def catch_up(self, entities: list[Entity] | None = None) -> None:
+        """Apply the ticks dormant entities missed up to the current one, which they didn't miss yet."""
+        now = current_tick()
+        if entities is None:
+            entities = list(self.dormant)
+        actors = [entity for entity in entities if isinstance(entity, Actor)]
+        for entity in entities:
+            if isinstance(entity, Building):
+                entity.interactable.catch_up(now - self.dormant[entity])
+
+        if actors:
+            since = np.array([self.dormant[actor] for actor in actors], dtype=np.int64)
+            rows = np.array([actor.needs.row for actor in actors], dtype=np.intp)
+            self.game_map.needs_system.catch_up(rows, now - since)
+            for actor, first in zip(actors, since.tolist()):
+                # Fighters heal every 10 minutes, see Fighter.update.
+                heals = (now - 1) // 10 - (first - 1) // 10
+                if heals and actor.is_alive:
+                    actor.fighter.heal(heals)
+
+        for entity in entities:
+            self.dormant[entity] = now
@@ -0,0 +1,78 @@
+"""Integer ids of entities, to refer to entities without keeping them alive."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity import Entity
+
+# An id is the slot of the entity in the registry in the low bits and the generation of the slot above them.
+SLOT_BITS = 24
+SLOT_MASK = (1 << SLOT_BITS) - 1
+NO_ID = -1
+
+
+class EntityRegistry:
+    """Gives every entity of a map an integer id and finds entities by their ids in O(1).
+
+    The slot of a released entity is reused for new entities with the next generation, so the ids of
+    released entities never find another entity.
+    """
+
+    def __init__(self) -> None:
+        self.entities: list[Entity | None] = []
+        self.generations: list[int] = []
+        self.free_slots: list[int] = []
+
+    def register(self, entity: Entity) -> int:
+        """Give the entity a new id, unless it already has one here."""
+        if entity.id != NO_ID and self.get(entity.id) is entity:
+            return entity.id
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.entities)
+            self.entities.append(None)
+            self.generations.append(0)
+        self.entities[slot] = entity
+        entity.id = self.generations[slot] << SLOT_BITS | slot
+        return entity.id
+
+    def release(self, entity: Entity) -> None:
+        """Forget an entity which left the world for good, e.g. an eaten apple."""
+        slot = entity.id & SLOT_MASK
+        if self.get(entity.id) is not entity:
+            return
+        self.entities[slot] = None
+        self.generations[slot] += 1
+        self.free_slots.append(slot)
+        entity.id = NO_ID
+
+    def replace(self, entity: Entity, successor: Entity) -> None:
+        """Give the id of the entity to its successor, e.g. to the corpse of a dead actor."""
+        if self.get(entity.id) is not entity:
+            self.register(successor)
+            return
+        self.entities[entity.id & SLOT_MASK] = successor
+        successor.id, entity.id = entity.id, NO_ID
+
+    def get(self, entity_id: int) -> Entity | None:
+        """Return the entity with the id, or None if it was released."""
+        slot = entity_id & SLOT_MASK
+        if entity_id < 0 or slot >= len(self.entities) or self.generations[slot] != entity_id >> SLOT_BITS:
+            return None
+        return self.entities[slot]
+
+    def name_of(self, entity_id: int) -> str:
+        entity = self.get(entity_id)
+        return entity.full_name if entity else "something which is gone"
+
+    def restore(self, entities: Iterable[Entity], generations: list[int], free_slots: list[int]) -> None:
+        """Refill an empty registry with entities which keep their ids, e.g. from a save."""
+        self.generations = generations
+        self.entities = [None] * len(generations)
+        self.free_slots = free_slots
+        for entity in entities:
+            if entity.id != NO_ID:
+                self.entities[entity.id & SLOT_MASK] = entity
@@ -0,0 +1,120 @@
+"""Recording and replaying the actions of the player.
+
+Everything else in the world is determined by its seed (see rng), so the seed and the actions of the player
+repeat a run tick for tick. Completions of the LLM arrive in the background, so replays should take them
+from the cache in replay-only mode (constants.llm_replay_only) to get them on the same ticks.
+
+An action log is a JSON lines file. The first line holds the seed, every other line an action of the
+player and the tick it was taken on.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+import json
+import os
+
+from game_time import current_tick
+import actions
+import color
+import exceptions
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from entity import IntelligentActor
+
+
+class ActionLog:
+    """Writes the actions of the player to a file as they are taken, so a crash loses none of them."""
+
+    def __init__(self, filename: str, seed: int, resume_at: int | None = None):
+        """Start a new log, or with `resume_at` continue the log of a game loaded from a save of that tick.
+
+        Actions which the log holds from `resume_at` on were taken after the save was made, so they are dropped.
+        """
+        if resume_at is None:
+            self.file = open(filename, "w")
+            self._write({"seed": seed})
+            return
+
+        with open(filename) as f:
+            header, *records = [json.loads(line) for line in f if line.strip()]
+        if header["seed"] != seed:
+            raise exceptions.ReplayDiverged(f"{filename} logs the world with seed {header['seed']}, not {seed}.")
+        with open(filename + ".tmp", "w") as f:
+            for record in [header, *(record for record in records if record["tick"] < resume_at)]:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(filename + ".tmp", filename)
+        self.file = open(filename, "a")
+
+    def record(self, action: actions.Action) -> None:
+        self._write({"tick": current_tick(), **encode(action)})
+
+    def close(self) -> None:
+        self.file.close()
+
+    def _write(self, record: dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+
+class Replay:
+    """Takes the actions of an action log in place of the player."""
+
+    def __init__(self, filename: str):
+        with open(filename) as f:
+            header, *self.records = [json.loads(line) for line in f if line.strip()]
+        self.seed: int = header["seed"]
+        self.position = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.records)
+
+    def play_turn(self, engine: Engine) -> bool:
+        """Take the actions of the player up to the one which ends its turn. The caller advances the tick.
+
+        Returns False if the log ended before such an action, then the recorded run stopped in this turn.
+        """
+        while not self.finished:
+            record = self.records[self.position]
+            self.position += 1
+            if record["tick"] != current_tick():
+                raise exceptions.ReplayDiverged(
+                    f"Action {self.position} was taken on tick {record['tick']}, not {current_tick()}."
+                )
+
+            action = decode(record, engine.player)
+            try:
+                action.perform()
+            except exceptions.Impossible as exc:
+                engine.add_observation(exc.args[0], color.impossible)
+                continue
+            if not action.instant:
+                return True
+        return False
+
+
+def encode(action: actions.Action) -> dict[str, Any]:
+    record: dict[str, Any] = {"action": type(action).__name__}
+    if isinstance(action, actions.ActionWithDirection):
+        record["dx"], record["dy"] = action.dx, action.dy
+    if isinstance(action, actions.ItemAction):
+        record["item"] = action.entity.inventory.items.index(action.item)
+        record["target_xy"] = action.target_xy
+    if isinstance(action, actions.QueryAction):
+        record["query"] = action.query
+    return record
+
+
+def decode(record: dict[str, Any], player: IntelligentActor) -> actions.Action:
+    action_type = getattr(actions, record["action"])
+    if not (isinstance(action_type, type) and issubclass(action_type, actions.Action)):
+        raise exceptions.ReplayDiverged(f"{record['action']} is not an action.")
+
+    if issubclass(action_type, actions.ActionWithDirection):
+        return action_type(player, record["dx"], record["dy"])
+    if issubclass(action_type, actions.ItemAction):
+        return action_type(player, player.inventory.items[record["item"]], tuple(record["target_xy"]))
+    if issubclass(action_type, actions.QueryAction):
+        return action_type(player, record["query"])
+    return action_type(player)  # type: ignore[call-arg]
@@ -0,0 +1,24 @@
+"""The random number generator of the world.
+
+Everything random in the simulation (generation of the map, factories, AIs) draws from `world`, so a run
+started with the same seed and the same player actions is repeated tick for tick.
+"""
+from __future__ import annotations
+
+import random
+
+import constants
+
+world = random.Random()
+current_seed = 0
+
+
+def seed(value: int | None = None) -> int:
+    """Seed the world and return the seed. Without a value a random seed is chosen."""
+    global current_seed
+    current_seed = value if value is not None else random.SystemRandom().randrange(2**32)
+    world.seed(current_seed)
+    return current_seed
+
+
+seed(constants.world_seed)
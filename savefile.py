@@ -0,0 +1,710 @@
+"""Save files of game sessions.
+
+A save starts with a header: MAGIC, the format version and the name of the compressor of the rest. The
+rest is the length of a JSON document, the document and the NumPy arrays it lists in .npy format.
+Arrays start at multiples of ARRAY_ALIGN in the file, so the arrays of saves which are not compressed
+(compressor "none") can be memory-mapped instead of read, see `open_snapshot`.
+
+Autosave appends what changed since the previous save to a journal next to the save instead of
+rewriting it. A journal starts with the same header and the id of its save, followed by records of
+changes, each prefixed by its length. `load` replays the journal onto the save.
+
+Nothing is pickled. Tiles and explored tiles are stored as raw arrays, entities as columns with one
+row per entity, and observation logs as columns with one row per observation. Records which are
+not worth a column (components with few fields, AI state) go into the JSON document. Entities keep
+their registry ids, so ids stored by components stay valid. The state of the random number
+generator of the world (see rng) is saved too, so a loaded game draws what the saved one would have
+drawn and its action log can be continued. External
+handles (event subscriptions, scheduler registrations, LLM clients, embeddings, caches) are not saved
+and are rebuilt on load.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+import io
+import json
+import os
+import struct
+import zlib
+
+from numpy.typing import NDArray
+import numpy as np
+
+from components.ai import BaseAI, ConfusedEnemy
+from components.consumable import Consumable
+from components.fighter import Fighter
+from components.identitity import Gender, Identity
+from components.interactable import Interactable
+from components.inventory import Inventory
+from components.needs import Needs
+from components.observation_log import Observation, ObservationLog, Summary
+from components.relationships import Relationships
+from components.stats import Stats
+from engine import Engine
+from entity import Actor, Building, Corpse, Entity, IntelligentActor, Item
+from entity_kind import EntityKind
+from fov import FOVSystem
+from game_map import ChunkedGameMap, GameMap
+from game_time import Phase, scheduler
+from llm import generate_summary
+from render_order import RenderOrder
+import components.ai
+import components.consumable
+import components.interactable
+import components.observation_log
+import events
+import game_time
+import rng
+
+if TYPE_CHECKING:
+    from events import TickEvent
+
+MAGIC = b"RLSAVE"
+# Must be incremented whenever the layout changes.
+FORMAT_VERSION = 5
+_header = struct.Struct("<6sH4s")
+_length = struct.Struct("<I")
+_snapshot_id = struct.Struct("<16s")
+ARRAY_ALIGN = 64
+
+# Name -> (compress, decompress). Faster compressors are preferred when they are installed.
+compressors: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (bytes, bytes),
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+try:
+    import zstandard  # type: ignore
+
+    compressors["zstd"] = (zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress)
+except ImportError:
+    pass
+try:
+    import lz4.frame  # type: ignore
+
+    compressors["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+default_compressor = next(name for name in ("zstd", "lz4", "zlib") if name in compressors)
+
+entity_types: list[type[Entity]] = [Actor, IntelligentActor, Item, Building, Corpse]
+
+
+class SaveFormatError(Exception):
+    """Raised when a file is not a save which this version can load."""
+
+
+@dataclass
+class Snapshot:
+    """A game session converted by `dump`. `actors` are the actors of the rows of the actor columns."""
+
+    document: dict[str, Any]
+    arrays: dict[str, NDArray[Any]]
+    actors: list[Actor]
+
+
+def save(engine: Engine, filename: str, compressor: str = default_compressor) -> Snapshot:
+    """Save the whole session. The journal of the previous save is dropped."""
+    snapshot = dump(engine)
+    snapshot.document["snapshot_id"] = os.urandom(_snapshot_id.size).hex()
+    with open(f"{filename}.tmp", "wb") as f:
+        f.write(_header.pack(MAGIC, FORMAT_VERSION, compressor.encode()))
+        f.write(compressors[compressor][0](_pack(snapshot.document, snapshot.arrays, start=_header.size)))
+    os.replace(f"{filename}.tmp", filename)  # A crash while writing leaves the old save intact.
+    if os.path.exists(journal_name(filename)):
+        os.remove(journal_name(filename))
+    return snapshot
+
+
+def load(filename: str) -> Engine:
+    document, arrays = open_snapshot(filename, mode="r")
+    # The game keeps and changes the tiles it loads, and autosave replaces the file, so nothing may stay mapped.
+    arrays = {name: np.array(array, order="K") for name, array in arrays.items()}
+
+    if os.path.exists(journal_name(filename)):
+        with open(journal_name(filename), "rb") as f:
+            journal = f.read()
+        for delta in _read_journal(journal, document["snapshot_id"]):
+            document, arrays = apply_delta(document, arrays, *_unpack(delta))
+
+    return restore(document, arrays)
+
+
+def open_snapshot(filename: str, mode: str = "r") -> tuple[dict[str, Any], dict[str, NDArray[Any]]]:
+    """Return the document and the arrays of a save, without its journal.
+
+    The arrays of uncompressed saves are memory-mapped with `mode`, so opening them takes the same time
+    for any size of map and processes which open the same save share its memory. Arrays opened with
+    "r" are read-only, changes to arrays opened with "c" are not written back. Mapped arrays keep the
+    file open, so it can't be replaced (e.g. by `save` on Windows) while any of them is alive.
+    """
+    with open(filename, "rb") as f:
+        compressor = _check_header(f.read(_header.size))
+        if compressor != "none":
+            return _unpack(compressors[compressor][1](f.read()))
+
+        (length,) = _length.unpack(f.read(_length.size))
+        document = json.loads(f.read(length))
+        arrays = {}
+        for name, offset in document.pop("arrays").items():
+            f.seek(_header.size + _length.size + length + offset)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype)  # Empty files can't be mapped.
+                continue
+            order = "F" if fortran_order else "C"
+            arrays[name] = np.memmap(f, dtype, mode, offset=f.tell(), shape=shape, order=order)  # type: ignore
+    return document, arrays
+
+
+def journal_name(filename: str) -> str:
+    return f"{filename}.journal"
+
+
+def _check_header(data: bytes) -> str:
+    """Check the header and return the name of the compressor."""
+    magic, version, compressor = _header.unpack_from(data)
+    compressor = compressor.rstrip(b"\0").decode()
+    if magic != MAGIC:
+        raise SaveFormatError("Not a save file.")
+    if version != FORMAT_VERSION:
+        raise SaveFormatError(f"Save format version {version} is not supported, expected {FORMAT_VERSION}.")
+    if compressor not in compressors:
+        raise SaveFormatError(f"The save is compressed with {compressor} which is not installed.")
+    return compressor
+
+
+def _read_journal(journal: bytes, snapshot_id: str) -> list[bytes]:
+    """Return the decompressed records of a journal, or none if it belongs to another save."""
+    magic, version, compressor = _header.unpack_from(journal)
+    (journal_snapshot_id,) = _snapshot_id.unpack_from(journal, _header.size)
+    if magic != MAGIC or version != FORMAT_VERSION or journal_snapshot_id.hex() != snapshot_id:
+        return []
+    decompress = compressors[compressor.rstrip(b"\0").decode()][1]
+
+    records = []
+    offset = _header.size + _snapshot_id.size
+    while offset + _length.size <= len(journal):
+        (length,) = _length.unpack_from(journal, offset)
+        offset += _length.size
+        if offset + length > len(journal):
+            break  # The game stopped while the record was written.
+        records.append(decompress(journal[offset : offset + length]))
+        offset += length
+    return records
+
+
+def _pack(document: dict[str, Any], arrays: dict[str, NDArray[Any]], start: int = 0) -> bytes:
+    """Pack a document and its arrays. The arrays are aligned for files in which the result is at `start`."""
+    stream = io.BytesIO()
+    offsets = {}
+    for name, array in arrays.items():
+        stream.write(bytes(-stream.tell() % ARRAY_ALIGN))
+        offsets[name] = stream.tell()
+        np.lib.format.write_array(stream, array, allow_pickle=False)  # Pads its header to 64 bytes.
+
+    encoded = json.dumps({**document, "arrays": offsets}, separators=(",", ":")).encode()
+    encoded += b" " * (-(start + _length.size + len(encoded)) % ARRAY_ALIGN)
+    return _length.pack(len(encoded)) + encoded + stream.getbuffer()
+
+
+def _unpack(body: bytes) -> tuple[dict[str, Any], dict[str, NDArray[Any]]]:
+    (length,) = _length.unpack_from(body)
+    document = json.loads(bytes(body[_length.size : _length.size + length]))
+    stream = io.BytesIO(body[_length.size + length :])
+    arrays = {}
+    for name, offset in document.pop("arrays").items():
+        stream.seek(offset)
+        arrays[name] = np.lib.format.read_array(stream, allow_pickle=False)
+    return document, arrays
+
+
+def _component(component: Any) -> dict[str, Any]:
+    """Record of a component whose attributes are plain values."""
+    state = {key: value for key, value in vars(component).items() if key != "parent"}
+    return {"type": type(component).__name__, **state}
+
+
+def _ai(ai: BaseAI | None) -> dict[str, Any] | None:
+    if ai is None:
+        return None
+    record: dict[str, Any] = {"type": type(ai).__name__}
+    if hasattr(ai, "path"):
+        record["path"] = ai.path
+    if isinstance(ai, ConfusedEnemy):
+        record["previous_ai"] = _ai(ai.previous_ai)
+        record["turns_remaining"] = ai.turns_remaining
+    return record
+
+
+def dump(engine: Engine) -> Snapshot:
+    """Convert a game session into a JSON document and arrays."""
+    game_map = engine.game_map
+    fov = game_map.fov
+    if isinstance(game_map, ChunkedGameMap) or not isinstance(fov, FOVSystem):
+        raise SaveFormatError("Chunked maps can't be saved yet.")
+    # Actors in the order of their turns first, so they keep it when added back.
+    next_turns = game_map.turns.scheduled()
+    on_map = list(next_turns) + [entity for entity in game_map.entities if entity not in next_turns]
+    in_inventories = [(owner, item) for owner in on_map if isinstance(owner, Actor) for item in owner.inventory.items]
+    entities: list[Entity] = on_map + [item for _, item in in_inventories]
+    rows = {entity: row for row, entity in enumerate(entities)}
+    owners = np.full(len(entities), -1, dtype=np.int32)
+    for owner, item in in_inventories:
+        owners[rows[item]] = rows[owner]
+    actors = [entity for entity in entities if isinstance(entity, Actor)]
+    kinds = [kind.name for kind in EntityKind]
+    render_orders = [order.name for order in RenderOrder]
+
+    arrays: dict[str, NDArray[Any]] = {
+        "tiles": game_map.tiles,
+        "entity.type": np.array([entity_types.index(type(entity)) for entity in entities], dtype=np.uint8),
+        "entity.id": np.array([entity.id for entity in entities], dtype=np.int64),
+        "entity.owner": owners,
+        "entity.x": np.array([entity.x for entity in entities], dtype=np.int32),
+        "entity.y": np.array([entity.y for entity in entities], dtype=np.int32),
+        "entity.char": np.array([ord(entity.char) for entity in entities], dtype=np.uint32),
+        "entity.color": np.array([entity.color for entity in entities], dtype=np.uint8).reshape(-1, 3),
+        "entity.kind": np.array([kinds.index(entity.kind.name) for entity in entities], dtype=np.uint8),
+        "entity.render_order": np.array(
+            [render_orders.index(entity.render_order.name) for entity in entities], dtype=np.uint8
+        ),
+        "entity.blocks_movement": np.array([entity.blocks_movement for entity in entities], dtype=bool),
+        "entity.dormant_since": np.array(
+            [game_map.regions.dormant.get(entity, -1) for entity in entities], dtype=np.int64
+        ),
+        "registry.generations": np.array(game_map.registry.generations, dtype=np.int64),
+        "registry.free": np.array(game_map.registry.free_slots, dtype=np.int64),
+        "actor.next_turn": np.array([next_turns.get(actor, -1) for actor in actors], dtype=np.int64),
+        "actor.energy": np.array([actor.energy for actor in actors], dtype=np.int32),
+        "actor.speed": np.array([actor.speed for actor in actors], dtype=np.int32),
+        "actor.eyesight": np.array([actor.eyesight for actor in actors], dtype=np.int32),
+        "actor.needs": np.array([actor.needs.system.values[actor.needs.row] for actor in actors], dtype=np.int32),
+        "actor.max_needs": np.array([actor.needs.system.maxima[actor.needs.row] for actor in actors], dtype=np.int32),
+        "actor.fighter": np.array(
+            [(actor.fighter.hp, actor.fighter.max_hp, actor.fighter.defense, actor.fighter.power) for actor in actors],
+            dtype=np.int32,
+        ),
+        "actor.explored": np.array([fov.explored_bits[fov.views[actor].row] for actor in actors], dtype=np.uint8),
+    }
+    arrays.update(_dump_logs([actor.observation_log for actor in actors]))
+    rng_version, rng_state, gauss_next = rng.world.getstate()
+    arrays["rng.state"] = np.array(rng_state, dtype=np.uint32)
+
+    document = {
+        "tick": game_time.current_tick(),
+        "observation_id": components.observation_log.observation_id,
+        "rng": {"seed": rng.current_seed, "version": rng_version, "gauss_next": gauss_next},
+        "width": game_map.width,
+        "height": game_map.height,
+        "player": rows[engine.player],
+        "entity_types": [entity_type.__name__ for entity_type in entity_types],
+        "kinds": kinds,
+        "render_orders": render_orders,
+        "identities": [
+            (entity.identity.name, entity.identity.text, entity.identity.gender.name) for entity in entities
+        ],
+        "items": {rows[item]: _component(item.consumable) for item in entities if isinstance(item, Item)},
+        "buildings": {
+            rows[building]: _component(building.interactable) for building in entities if isinstance(building, Building)
+        },
+        "corpses": {rows[corpse]: corpse.died_at for corpse in entities if isinstance(corpse, Corpse)},
+        "actors": [
+            {
+                "ai": _ai(actor.ai),
+                "observed_events": [event_type.__name__ for event_type in actor.observed_events],
+                "inventory": (actor.inventory.capacity, actor.inventory.gold),
+                "stats": {**_component(actor.stats), "age": actor.stats.age.total_seconds()},
+                "relationships": list(actor.relationships.state.items()),
+                "observation_log": {
+                    "capacity": actor.observation_log.capacity,
+                    "summarizer": actor.observation_log.summarizer is not None,
+                    "unsummarized": actor.observation_log.unsummarized,
+                    "summaries": [
+                        (summary.text, summary.first_tick, summary.last_tick)
+                        for summary in actor.observation_log.summaries
+                    ],
+                },
+            }
+            for actor in actors
+        ],
+    }
+    return Snapshot(document, arrays, actors)
+
+
+def _dump_logs(logs: list[ObservationLog]) -> dict[str, NDArray[Any]]:
+    """Observations of all logs as columns. Texts are stored once and referred to by index."""
+    observations = [observation for log in logs for observation in log]
+    texts: dict[str, int] = {}
+    text_indices = [texts.setdefault(observation.text, len(texts)) for observation in observations]
+    encoded = [text.encode() for text in texts]
+    return {
+        "log.offsets": np.cumsum([0] + [len(log) for log in logs], dtype=np.int64),
+        "log.id": np.array([observation.id for observation in observations], dtype=np.int64),
+        "log.tick": np.array([observation.tick for observation in observations], dtype=np.int64),
+        "log.fg": np.array([observation.fg for observation in observations], dtype=np.uint8).reshape(-1, 3),
+        "log.importance": np.concatenate([np.zeros(0, np.float32)] + [log.importance_of_all() for log in logs]),
+        "log.text": np.array(text_indices, dtype=np.uint32),
+        "text.offsets": np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64),
+        "text.data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+
+def _load_component(module: Any, base: type, record: dict[str, Any]) -> Any:
+    """Create a component from its record without calling its constructor."""
+    cls = getattr(module, record.pop("type"))
+    if not (isinstance(cls, type) and issubclass(cls, base)):
+        raise SaveFormatError(f"{cls!r} is not a {base.__name__}.")
+    component = cls.__new__(cls)
+    vars(component).update(record)
+    return component
+
+
+def _load_ai(record: dict[str, Any] | None, actor: Actor) -> BaseAI | None:
+    if record is None:
+        return None
+    cls = getattr(components.ai, record["type"])
+    if not (isinstance(cls, type) and issubclass(cls, BaseAI)):
+        raise SaveFormatError(f"{cls!r} is not an AI.")
+
+    ai: BaseAI
+    if cls is ConfusedEnemy:
+        ai = ConfusedEnemy(actor, _load_ai(record["previous_ai"], actor), record["turns_remaining"])
+    else:
+        ai = cls(actor)  # Handles to external services are created here.
+    if "path" in record:
+        ai.path = [(x, y) for x, y in record["path"]]  # type: ignore[attr-defined]
+    return ai
+
+
+def restore(document: dict[str, Any], arrays: dict[str, NDArray[Any]]) -> Engine:
+    """Create a game session from a JSON document and arrays made by `dump`."""
+    game_time.set_current_tick(document["tick"])
+    components.observation_log.observation_id = document["observation_id"]
+
+    types = [{cls.__name__: cls for cls in entity_types}[name] for name in document["entity_types"]]
+    kinds = [EntityKind[name] for name in document["kinds"]]
+    render_orders = [RenderOrder[name] for name in document["render_orders"]]
+    items = {int(row): record for row, record in document["items"].items()}
+    buildings = {int(row): record for row, record in document["buildings"].items()}
+    corpses = {int(row): died_at for row, died_at in document["corpses"].items()}
+    logs = _load_logs(arrays)
+
+    entities: list[Entity] = []
+    actors: list[Actor] = []
+    for row, (name, text, gender) in enumerate(document["identities"]):
+        cls = types[arrays["entity.type"][row]]
+        entity = cls.__new__(cls)
+        entity.id = int(arrays["entity.id"][row])
+        entity.x = int(arrays["entity.x"][row])
+        entity.y = int(arrays["entity.y"][row])
+        entity.char = chr(arrays["entity.char"][row])
+        entity.color = tuple(arrays["entity.color"][row].tolist())  # type: ignore[assignment]
+        entity.kind = kinds[arrays["entity.kind"][row]]
+        entity.render_order = render_orders[arrays["entity.render_order"][row]]
+        entity.blocks_movement = bool(arrays["entity.blocks_movement"][row])
+        entity.identity = Identity.__new__(Identity)
+        entity.identity.name, entity.identity.text, entity.identity.gender = name, text, Gender[gender]
+        entity.identity.parent = entity  # type: ignore[assignment]
+
+        if isinstance(entity, Item):
+            entity.consumable = _load_component(components.consumable, Consumable, items[row])
+            entity.consumable.parent = entity
+        elif isinstance(entity, Building):
+            entity.interactable = _load_component(components.interactable, Interactable, buildings[row])
+            entity.interactable.parent = entity
+        elif isinstance(entity, Corpse):
+            entity.died_at = corpses[row]
+        else:
+            assert isinstance(entity, Actor)
+            _restore_actor(entity, len(actors), document["actors"][len(actors)], arrays, logs)
+            actors.append(entity)
+        entities.append(entity)
+
+    player = entities[document["player"]]
+    assert isinstance(player, IntelligentActor)
+    engine = Engine(player=player)
+    game_map = GameMap(engine, document["width"], document["height"])
+    engine.game_map = game_map
+    game_map.tiles = arrays["tiles"]
+    game_map.registry.restore(entities, arrays["registry.generations"].tolist(), arrays["registry.free"].tolist())
+
+    owners = arrays["entity.owner"].tolist()
+    for entity, owner in zip(entities, owners):
+        if owner < 0:
+            game_map.add_entity(entity)
+        else:
+            inventory = entities[owner].inventory  # type: ignore[attr-defined]
+            entity.parent = inventory
+            inventory.items.append(entity)
+
+    fov = game_map.fov
+    assert isinstance(fov, FOVSystem)
+    for i, actor in enumerate(actors):
+        fov.explored_bits[fov.views[actor].row] = arrays["actor.explored"][i]
+        next_turn = int(arrays["actor.next_turn"][i])
+        if next_turn >= 0:
+            game_map.turns.add(actor, next_turn)
+        else:
+            game_map.turns.remove(actor)
+        actor.energy = int(arrays["actor.energy"][i])
+        if actor.is_alive:
+            actor._update_fov()
+        else:
+            game_map.lifecycle.died(actor)  # Saved between its death and the next tick.
+
+    for entity, owner, since in zip(entities, owners, arrays["entity.dormant_since"].tolist()):
+        if owner < 0 and since >= 0:
+            game_map.regions.sleep(entity, since)
+
+    # Last, since rebuilding the session draws from the generator.
+    rng.current_seed = document["rng"]["seed"]
+    rng_state = tuple(arrays["rng.state"].tolist())
+    rng.world.setstate((document["rng"]["version"], rng_state, document["rng"]["gauss_next"]))
+    return engine
+
+
+def _restore_actor(
+    actor: Actor, i: int, record: dict[str, Any], arrays: dict[str, NDArray[Any]], logs: list[list[Observation]]
+) -> None:
+    actor.speed = int(arrays["actor.speed"][i])
+    actor.eyesight = int(arrays["actor.eyesight"][i])
+    actor.energy = int(arrays["actor.energy"][i])
+
+    hp, max_hp, defense, power = arrays["actor.fighter"][i].tolist()
+    actor.fighter = Fighter(hp=hp, defense=defense, power=power)
+    actor.fighter.max_hp = max_hp
+
+    capacity, gold = record["inventory"]
+    actor.inventory = Inventory(capacity)
+    actor.inventory.gold = gold
+
+    max_needs = arrays["actor.max_needs"][i].tolist()
+    actor.needs = Needs(*max_needs)
+    actor.needs.system.values[actor.needs.row] = arrays["actor.needs"][i]
+
+    stats = record["stats"]
+    del stats["type"]
+    actor.stats = Stats(**{**stats, "age": timedelta(seconds=stats["age"])})
+
+    actor.relationships = Relationships()
+    actor.relationships.state = {actor_id: value for actor_id, value in record["relationships"]}
+
+    log_record = record["observation_log"]
+    actor.observation_log = ObservationLog(
+        log_record["capacity"], summarizer=generate_summary if log_record["summarizer"] else None
+    )
+    importance = arrays["log.importance"][arrays["log.offsets"][i] : arrays["log.offsets"][i + 1]].tolist()
+    actor.observation_log.restore(
+        zip(logs[i], importance),
+        [Summary(*summary) for summary in log_record["summaries"]],
+        log_record["unsummarized"],
+    )
+
+    for component in (
+        actor.fighter,
+        actor.inventory,
+        actor.needs,
+        actor.stats,
+        actor.observation_log,
+        actor.relationships,
+    ):
+        component.parent = actor
+
+    actor.observed_events = tuple(getattr(events, name) for name in record["observed_events"])
+    actor.ai = _load_ai(record["ai"], actor)
+
+
+def _load_logs(arrays: dict[str, NDArray[Any]]) -> list[list[Observation]]:
+    text_offsets = arrays["text.offsets"].tolist()
+    data = arrays["text.data"].tobytes()
+    texts = [data[start:end].decode() for start, end in zip(text_offsets, text_offsets[1:])]
+
+    observations = [
+        Observation(texts[text], tuple(fg), tick, id)  # type: ignore[arg-type]
+        for text, fg, tick, id in zip(
+            arrays["log.text"].tolist(),
+            arrays["log.fg"].tolist(),
+            arrays["log.tick"].tolist(),
+            arrays["log.id"].tolist(),
+        )
+    ]
+    offsets = arrays["log.offsets"].tolist()
+    return [observations[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+_log_columns = ("log.id", "log.tick", "log.fg", "log.importance", "log.text")
+
+
+def make_delta(previous: Snapshot, current: Snapshot) -> tuple[dict[str, Any], dict[str, NDArray[Any]]]:
+    """Return what changed from `previous` to `current`, as a JSON document and arrays.
+
+    Entity columns and records are small and written whole. Of tiles only the changed columns are
+    written, of explored tiles only the changed actors and of observation logs only new observations.
+    """
+    arrays = {
+        name: array
+        for name, array in current.arrays.items()
+        if name != "tiles" and not name.startswith(("actor.explored", "log.", "text."))
+    }
+
+    previous_rows = {actor: row for row, actor in enumerate(previous.actors)}
+    previous_row = np.array([previous_rows.get(actor, -1) for actor in current.actors], dtype=np.int64)
+    arrays["actor.previous_row"] = previous_row
+
+    tiles = current.arrays["tiles"]
+    changed_columns = np.flatnonzero((_raw(tiles) != _raw(previous.arrays["tiles"])).any(axis=1))
+    arrays["tiles.columns"] = changed_columns
+    arrays["tiles"] = tiles[changed_columns]
+
+    explored = current.arrays["actor.explored"]
+    previous_explored = previous.arrays["actor.explored"][np.maximum(previous_row, 0)]
+    unchanged = (previous_row >= 0) & (explored == previous_explored).all(axis=(1, 2))
+    arrays["actor.explored.rows"] = np.flatnonzero(~unchanged)
+    arrays["actor.explored"] = explored[~unchanged]
+
+    # Observations are only ever appended, so those with ids above the last saved one of their actor are new.
+    previous_offsets = previous.arrays["log.offsets"]
+    previous_ids = previous.arrays["log.id"]
+    last_ids = np.array(
+        [previous_ids[start:end].max(initial=-1) for start, end in zip(previous_offsets[:-1], previous_offsets[1:])],
+        dtype=np.int64,
+    )
+    offsets = current.arrays["log.offsets"]
+    owners = np.repeat(np.arange(len(current.actors)), np.diff(offsets))
+    last_id = np.where(previous_row >= 0, last_ids[previous_row] if len(last_ids) else -1, -1)
+    new = current.arrays["log.id"] > last_id[owners]
+    arrays["log.offsets"] = np.concatenate([[0], np.cumsum(np.bincount(owners[new], minlength=len(current.actors)))])
+    for name in _log_columns:
+        arrays[name] = current.arrays[name][new]
+    arrays.update(_subset_texts(arrays, current.arrays))
+
+    return current.document, arrays
+
+
+def apply_delta(
+    document: dict[str, Any],
+    arrays: dict[str, NDArray[Any]],
+    delta_document: dict[str, Any],
+    delta: dict[str, NDArray[Any]],
+) -> tuple[dict[str, Any], dict[str, NDArray[Any]]]:
+    """Return the document and arrays of a save after the changes made by `make_delta`."""
+    result = {
+        name: array
+        for name, array in delta.items()
+        if name != "actor.previous_row" and not name.startswith(("tiles", "actor.explored", "log.", "text."))
+    }
+    previous_row = delta["actor.previous_row"]
+
+    result["tiles"] = arrays["tiles"].copy(order="F")
+    result["tiles"][delta["tiles.columns"]] = delta["tiles"]
+
+    explored = np.zeros((len(previous_row), *arrays["actor.explored"].shape[1:]), dtype=np.uint8)
+    kept = previous_row >= 0
+    explored[kept] = arrays["actor.explored"][previous_row[kept]]
+    explored[delta["actor.explored.rows"]] = delta["actor.explored"]
+    result["actor.explored"] = explored
+
+    # Append the new observations of every actor to its old ones and keep as many as fit in the log.
+    texts = len(arrays["text.offsets"]) - 1
+    columns: dict[str, list[NDArray[Any]]] = {name: [] for name in _log_columns}
+    counts = []
+    for i, row in enumerate(previous_row.tolist()):
+        parts = []
+        if row >= 0:
+            start, end = arrays["log.offsets"][row], arrays["log.offsets"][row + 1]
+            parts.append({name: arrays[name][start:end] for name in _log_columns})
+        start, end = delta["log.offsets"][i], delta["log.offsets"][i + 1]
+        parts.append({name: delta[name][start:end] for name in _log_columns})
+        parts[-1]["log.text"] = parts[-1]["log.text"] + texts
+
+        capacity = delta_document["actors"][i]["observation_log"]["capacity"]
+        for name in _log_columns:
+            columns[name].append(np.concatenate([part[name] for part in parts])[-capacity:])
+        counts.append(len(columns["log.id"][-1]))
+
+    result["log.offsets"] = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    for name in _log_columns:
+        result[name] = np.concatenate(columns[name]) if columns[name] else arrays[name][:0]
+    result["text.offsets"] = np.concatenate(
+        [arrays["text.offsets"], arrays["text.offsets"][-1] + delta["text.offsets"][1:]]
+    )
+    result["text.data"] = np.concatenate([arrays["text.data"], delta["text.data"]])
+    result.update(_subset_texts(result, result))
+
+    return delta_document, result
+
+
+def _raw(tiles: NDArray[Any]) -> NDArray[np.uint8]:
+    """Bytes of every tile, one row per column of the map."""
+    return np.ascontiguousarray(tiles).view(np.uint8).reshape(tiles.shape[0], -1)
+
+
+def _subset_texts(columns: dict[str, NDArray[Any]], table: dict[str, NDArray[Any]]) -> dict[str, NDArray[Any]]:
+    """Keep only the texts of the string table of `table` which are used by `columns`, and renumber them."""
+    used, columns["log.text"] = np.unique(columns["log.text"], return_inverse=True)
+    columns["log.text"] = columns["log.text"].astype(np.uint32)
+    starts, ends = table["text.offsets"][used], table["text.offsets"][used + 1]
+    data = table["text.data"]
+    return {
+        "text.offsets": np.concatenate([[0], np.cumsum(ends - starts)]).astype(np.int64),
+        "text.data": np.concatenate([data[:0]] + [data[start:end] for start, end in zip(starts, ends)]),
+    }
+
+
+class Autosave:
+    """Saves the session every `every` ticks.
+
+    The first save is a full one. After that only what changed is appended to the journal, and every
+    `compact_every` records the journal is folded into a new full save.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        filename: str,
+        every: int = 100,
+        compact_every: int = 10,
+        compressor: str = default_compressor,
+    ):
+        self.engine = engine
+        self.filename = filename
+        self.every = every
+        self.compact_every = compact_every
+        self.compressor = compressor
+        self._previous: Snapshot | None = None
+        self._records = 0
+        scheduler.add(Phase.SAVE, self.update)
+
+    def update(self, event: TickEvent) -> None:
+        if game_time.current_tick() % self.every == 0:
+            self.save()
+
+    def save(self) -> None:
+        if self._previous is None or self._records >= self.compact_every:
+            self._previous = save(self.engine, self.filename, self.compressor)
+            self._previous.arrays["tiles"] = self._previous.arrays["tiles"].copy(order="F")
+            self._records = 0
+            return
+
+        current = dump(self.engine)
+        current.arrays["tiles"] = current.arrays["tiles"].copy(order="F")  # The map keeps changing its own.
+        record = compressors[self.compressor][0](_pack(*make_delta(self._previous, current)))
+
+        journal = journal_name(self.filename)
+        if not os.path.exists(journal):
+            with open(journal, "wb") as f:
+                f.write(_header.pack(MAGIC, FORMAT_VERSION, self.compressor.encode()))
+                f.write(_snapshot_id.pack(bytes.fromhex(self._previous.document["snapshot_id"])))
+        with open(journal, "ab") as f:
+            f.write(_length.pack(len(record)) + record)
+
+        current.document["snapshot_id"] = self._previous.document["snapshot_id"]
+        self._previous = current
+        self._records += 1
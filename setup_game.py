@@ -1,26 +1,39 @@
 """Handle the loading and initialization of game sessions."""
 from __future__ import annotations
 
-import lzma
-import pickle
 import traceback
 
 import tcod
 
 from engine import Engine
-from procgen import generate_island
+from exceptions import ReplayDiverged
+from game_map import ChunkedGameMap
+from procgen import generate_chunked_island, generate_island
+from replay import ActionLog
 import color
 import constants
 import entity_factories
+import game_time
 import input_handlers
+import rng
+import savefile
 
 # Load the background image and remove the alpha channel.
 background_image = tcod.image.load("menu_background.png")[:, :, :3]
 
 
-def new_game() -> Engine:
-    """Return a brand new game session as an Engine instance."""
+def new_game(
+    seed: int | None = constants.world_seed,
+    action_log: str | None = None,
+    world_size: int | None = None,
+    chunk_directory: str = constants.chunk_directory,
+) -> Engine:
+    """Return a brand new game session as an Engine instance.
 
+    The actions of the player are written to `action_log` if it's given. With `world_size` the island is
+    a square of that size which is generated chunk by chunk as it is explored, kept in `chunk_directory`.
+    """
+    seed = rng.seed(seed)
     player = entity_factories.create_player()
 
     engine = Engine(player=player)
@@ -35,19 +48,39 @@ def new_game() -> Engine:
     #     max_items_per_room=max_items_per_room,
     #     engine=engine,
     # )
-    engine.game_map = generate_island(constants.map_width, constants.map_height, engine)
-    player.parent = engine.game_map
-    engine.game_map.entities.add(player)
+    if world_size:
+        engine.game_map = generate_chunked_island(world_size, world_size, engine, chunk_directory)
+    else:
+        engine.game_map = generate_island(constants.map_width, constants.map_height, engine)
     player._update_fov()
 
+    if action_log:
+        engine.action_log = ActionLog(action_log, seed)
     return engine
 
 
-def load_game(filename: str) -> Engine:
-    """Load an Engine instance from a file."""
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
-    assert isinstance(engine, Engine)
+def load_game(filename: str, action_log: str | None = None) -> Engine:
+    """Load an Engine instance from a file.
+
+    The actions of the player are appended to `action_log` if it's given, after the actions it holds up to the
+    save, so it still replays the whole game from its seed. A log of another game isn't continued.
+    """
+    engine = savefile.load(filename)
+    if action_log:
+        try:
+            engine.action_log = ActionLog(action_log, rng.current_seed, resume_at=game_time.current_tick())
+        except (FileNotFoundError, ReplayDiverged) as exc:
+            print(f"Not recording actions, {action_log} can't be continued: {exc}")
+    return engine
+
+
+def start_autosave(engine: Engine, filename: str = "savegame.sav") -> Engine:
+    """Save the session every few ticks, so a crash loses little progress. Chunked maps can't be saved yet."""
+    if isinstance(engine.game_map, ChunkedGameMap):
+        return engine
+    engine.autosave = savefile.Autosave(
+        engine, filename, every=constants.autosave_every, compressor=constants.save_compressor
+    )
     return engine
 
 
@@ -91,13 +124,15 @@ class MainMenu(input_handlers.BaseEventHandler):
 
         if event.sym == tcod.event.K_c:
             try:
-                return input_handlers.MainGameEventHandler(load_game("savegame.sav"))
+                return input_handlers.MainGameEventHandler(
+                    start_autosave(load_game("savegame.sav", constants.action_log_path))
+                )
             except FileNotFoundError:
                 return input_handlers.PopupMessage(self, "No saved game to load.")
             except Exception as exc:
                 traceback.print_exc()  # Print to stderr.
                 return input_handlers.PopupMessage(self, f"Failed to load save:\n{exc}")
         elif event.sym == tcod.event.K_n:
-            return input_handlers.MainGameEventHandler(new_game())
+            return input_handlers.MainGameEventHandler(start_autosave(new_game(action_log=constants.action_log_path)))
 
         return None
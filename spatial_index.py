@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from numpy.typing import NDArray
+import numpy as np
+
+if TYPE_CHECKING:
+    from entity import Entity
+    from game_map import Area
+
+
+class BaseSpatialIndex(ABC):
+    """Per-tile index of the entities placed on a map.
+
+    `cells` maps a tile to the entities on it (in the order they arrived). Subclasses count the
+    movement-blocking entities on every tile, so location queries don't need to scan all entities.
+    """
+
+    def __init__(self) -> None:
+        self.cells: dict[tuple[int, int], list[Entity]] = {}
+
+    def at(self, x: int, y: int) -> list[Entity]:
+        """Return the entities at the given tile. The list must not be modified."""
+        return self.cells.get((x, y), [])
+
+    @abstractmethod
+    def is_blocked(self, x: int, y: int) -> bool:
+        """Return True if a blocking entity is on the tile."""
+
+    @abstractmethod
+    def blocking_window(self, area: Area) -> NDArray[np.int16]:
+        """Return the number of blocking entities on every tile of the area. It must not be modified."""
+
+    @abstractmethod
+    def _count_blocking(self, x: int, y: int, change: int) -> None:
+        """Change the number of blocking entities on a tile."""
+
+    def add(self, entity: Entity) -> None:
+        self.cells.setdefault((entity.x, entity.y), []).append(entity)
+        if entity.blocks_movement:
+            self._count_blocking(entity.x, entity.y, 1)
+
+    def remove(self, entity: Entity) -> None:
+        self._remove_at(entity, entity.x, entity.y)
+
+    def move(self, entity: Entity, old_x: int, old_y: int) -> None:
+        """Update the index after `entity` moved from (`old_x`, `old_y`) to its current position."""
+        self._remove_at(entity, old_x, old_y)
+        self.add(entity)
+
+    def set_blocking(self, entity: Entity, blocks_movement: bool) -> None:
+        """Update the index before `entity.blocks_movement` is changed."""
+        if entity.blocks_movement == blocks_movement:
+            return
+        self._count_blocking(entity.x, entity.y, 1 if blocks_movement else -1)
+
+    def _remove_at(self, entity: Entity, x: int, y: int) -> None:
+        cell = self.cells[x, y]
+        cell.remove(entity)
+        if not cell:
+            del self.cells[x, y]
+        if entity.blocks_movement:
+            self._count_blocking(x, y, -1)
+
+
+class SpatialIndex(BaseSpatialIndex):
+    """BaseSpatialIndex which counts blocking entities in an array with a count for every tile."""
+
+    def __init__(self, width: int, height: int):
+        super().__init__()
+        self.blocking: NDArray[np.int16] = np.zeros((width, height), dtype=np.int16, order="F")
+
+    def is_blocked(self, x: int, y: int) -> bool:
+        return bool(self.blocking[x, y])
+
+    def blocking_window(self, area: Area) -> NDArray[np.int16]:
+        x0, y0, x1, y1 = area
+        return self.blocking[x0:x1, y0:y1]
+
+    def _count_blocking(self, x: int, y: int, change: int) -> None:
+        self.blocking[x, y] += change
+
+
+class SparseSpatialIndex(BaseSpatialIndex):
+    """BaseSpatialIndex for maps too large for a count of blocking entities for every tile.
+
+    Counts are only kept for the tiles which have blocking entities on them.
+    """
+
+    def __init__(self, width: int, height: int):
+        super().__init__()
+        self.blocking: dict[tuple[int, int], int] = {}
+
+    def is_blocked(self, x: int, y: int) -> bool:
+        return bool(self.blocking.get((x, y)))
+
+    def blocking_window(self, area: Area) -> NDArray[np.int16]:
+        x0, y0, x1, y1 = area
+        result = np.zeros((x1 - x0, y1 - y0), dtype=np.int16, order="F")
+        for (x, y), count in self.blocking.items():
+            if x0 <= x < x1 and y0 <= y < y1:
+                result[x - x0, y - y0] = count
+        return result
+
+    def _count_blocking(self, x: int, y: int, change: int) -> None:
+        count = self.blocking.get((x, y), 0) + change
+        if count:
+            self.blocking[x, y] = count
+        else:
+            del self.blocking[x, y]